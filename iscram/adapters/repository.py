@@ -2,6 +2,8 @@ import abc
 from collections import OrderedDict
 
 from iscram.domain.model import SystemGraph
+from iscram.domain.metrics.bdd_manager import get_bdd_manager
+from iscram.domain.metrics.structural import release_structural_uncertainty
 
 
 class RepositoryLookupError(Exception):
@@ -22,10 +24,19 @@ class AbstractRepository(abc.ABC):
     def delete(self, key):
         raise NotImplementedError
 
+    @abc.abstractmethod
+    def get_data(self, key):
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def put_data(self, key, data):
+        raise NotImplementedError
+
 
 class FakeRepository(AbstractRepository):
     def __init__(self):
         self.storage = {}
+        self.data = {}
 
     def get(self, key):
         return self.storage.get(key)
@@ -37,10 +48,19 @@ class FakeRepository(AbstractRepository):
         if key in self.storage:
             del self.storage[key]
 
+    def get_data(self, key):
+        if key not in self.data:
+            raise RepositoryLookupError("Could not find data for key: " + key)
+        return self.data[key]
+
+    def put_data(self, key, data):
+        self.data[key] = data
+
 
 class LRUCacheRepository(AbstractRepository):
     def __init__(self, capacity=20):
         self._storage = OrderedDict()
+        self._data = {}  # data stored for a graph, dropped with the graph
         self.capacity = capacity
 
     def _get(self, key):
@@ -53,7 +73,10 @@ class LRUCacheRepository(AbstractRepository):
         self._storage[key] = data
         self._storage.move_to_end(key)
         if len(self._storage) > self.capacity:
-            self._storage.popitem(last=False)
+            evicted, _ = self._storage.popitem(last=False)
+            self._data.pop(evicted, None)
+            get_bdd_manager().release(evicted)
+            release_structural_uncertainty(evicted)
 
     @classmethod
     def _make_key(cls, sg: SystemGraph, resource_identifier: str = None):
@@ -74,4 +97,17 @@ class LRUCacheRepository(AbstractRepository):
     def delete(self, key):
         if key in self._storage:
             del self._storage[key]
+            self._data.pop(key, None)
+            get_bdd_manager().release(key)
+            release_structural_uncertainty(key)
+
+    def get_data(self, key):
+        self.get(key)
+        if key not in self._data:
+            raise RepositoryLookupError("Could not find data for key: " + key)
+        return self._data[key]
+
+    def put_data(self, key, data):
+        self.get(key)
+        self._data[key] = data
 
@@ -0,0 +1,47 @@
+import os
+import tempfile
+import zipfile
+
+import numpy as np
+
+from iscram.domain.metrics.compiled_bdd import CompiledBDD
+
+
+FORMAT_VERSION = 1
+
+
+class BDDDiskCache:
+    def __init__(self, directory: str):
+        """ Stores compiled BDDs, including the variable order they were compiled with, as one .npz file per
+        system graph id. Files are written atomically; unreadable files are treated as missing. """
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, "{}.v{}.npz".format(key, FORMAT_VERSION))
+
+    def __contains__(self, key):
+        return os.path.exists(self._path(key))
+
+    def load(self, key: str):
+        path = self._path(key)
+        if not os.path.exists(path):
+            return None
+        try:
+            with np.load(path, allow_pickle=False) as f:
+                return CompiledBDD(f["var_names"].tolist(), f["var"], f["high"], f["low"], f["low_negated"],
+                                   int(f["root"]), bool(f["root_negated"]))
+        except (OSError, ValueError, KeyError, zipfile.BadZipFile):
+            return None
+
+    def save(self, key: str, cbdd: CompiledBDD):
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.savez(f, var_names=np.array(cbdd.var_names, dtype=str), var=cbdd.var, high=cbdd.high,
+                         low=cbdd.low, low_negated=cbdd.low_negated, root=cbdd.root, root_negated=cbdd.root_negated)
+            os.replace(tmp, self._path(key))
+        except OSError:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
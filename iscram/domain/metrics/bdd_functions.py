@@ -1,5 +1,9 @@
+import time
+
 import dd.cudd as _bdd
 
+from iscram.domain.metrics.variable_ordering import dependencies, variable_order
+
 
 fmt_bdd = {"or": " | ", "and": " & "}
 
@@ -20,7 +24,8 @@ def build_sg_graph_dict(sg):
 
 
 def recursive_build_expr(sg, g, u, discovered):
-    """ DFS to build the logical expression encoding system graph structure. """
+    """ DFS to build the logical expression encoding system graph structure.
+    Shared dependencies are expanded once per path, so prefer build_node_functions for building BDDs. """
     # The discovered list is useful for BDD variable ordering heuristic
     discovered.append(u)
 
@@ -51,26 +56,163 @@ def recursive_build_expr(sg, g, u, discovered):
         return "( {} )".format(expr)
 
 
-def prep_for_bdd(sg):
-    g = build_sg_graph_dict(sg)
-    discovered = []
-    r_expr = recursive_build_expr(sg, g, "indicator", discovered)
-    return r_expr, discovered
+def dependency_orders(g, root="indicator"):
+    """ Iterative DFS over the dependency dictionary from root. Returns the nodes in discovery order (the same
+    order recursive_build_expr first reaches them, useful as a BDD variable ordering heuristic) and in post-order,
+    where every node comes after all of its dependencies. Only nodes reachable from root are included. """
+    discovered, post_order = [], []
+    state = {}  # node -> False while on the DFS stack, True when finished
+
+    stack = [(root, False)]
+    while stack:
+        u, expanded = stack.pop()
+        if expanded:
+            state[u] = True
+            post_order.append(u)
+            continue
+        if u in state:
+            if not state[u]:
+                raise ValueError("System graph dependencies contain a cycle through: {}".format(u))
+            continue
 
+        state[u] = False
+        discovered.append(u)
+        stack.append((u, True))
+        deps = dependencies(g, u)
+        stack.extend((d, False) for d in reversed(deps) if not state.get(d, False))
 
-def build_bdd(sg):
-    """ Main function to produce a BDD from a system graph. Returns the BDD and root node as a tuple."""
-    r_expr, nodes_as_discovered = prep_for_bdd(sg)
+    return discovered, post_order
 
-    bdd = _bdd.BDD(memory_estimate=(int(2**30 * 0.3)))
-    bdd.configure(reordering=True)
-    bdd.declare(*nodes_as_discovered)
-    r = bdd.add_expr(r_expr)
-    bdd.reorder()
 
+def prep_for_bdd(sg):
+    g = build_sg_graph_dict(sg)
+    discovered, post_order = dependency_orders(g, "indicator")
+    return g, discovered, post_order
+
+
+def build_node_functions(sg, g, post_order, bdd, memo=None):
+    """ Builds the BDD of every node in post_order, combining the memoized BDDs of its dependencies with apply.
+    Each shared sub-component is built once, so construction is linear in the number of edges (apply calls).
+    Functions for dependencies outside post_order, such as module pseudo-variables, can be supplied in memo. """
+    memo = {} if memo is None else dict(memo)
+    for u in post_order:
+        f = bdd.var(u)
+        comps = [memo[c] for c in g[u].get("component", [])]
+        if len(comps) > 0:
+            f = bdd.apply("or", f, combine_functions(bdd, sg.nodes[u].logic["component"], comps))
+        sups = [memo[s] for s in g[u].get("supplier", [])]
+        if len(sups) > 0:
+            f = bdd.apply("or", f, combine_functions(bdd, sg.nodes[u].logic.get("supplier", "and"), sups))
+        memo[u] = f
+    return memo
+
+
+def combine_functions(bdd, logic, functions):
+    result = functions[0]
+    for f in functions[1:]:
+        result = bdd.apply(logic, result, f)
+    return result
+
+
+def derive_node_functions(parent, sg, bdd, parent_functions):
+    """ Builds the node BDDs of sg in the manager holding the node BDDs of parent, a graph with the same nodes and
+    some different edges, e.g. after SystemGraph.with_suppliers. A node keeps its parent function when its own
+    dependencies and logic are unchanged and so are those of everything below it; only the other nodes are
+    combined again. Returns the functions and the number of rebuilt nodes. """
+    g, discovered, post_order = prep_for_bdd(sg)
+    g_parent = build_sg_graph_dict(parent)
+
+    missing = [u for u in discovered if u not in bdd.vars]
+    if missing:
+        bdd.declare(*missing)
+
+    def same_dependencies(u):
+        ours, theirs = g[u], g_parent.get(u, {})
+        return ours.keys() == theirs.keys() and all(sorted(ours[k]) == sorted(theirs[k]) for k in ours)
+
+    reused = {}
+    for u in post_order:
+        same = u in parent_functions and same_dependencies(u) and sg.nodes[u].logic == parent.nodes[u].logic
+        if same and all(d in reused for d in dependencies(g, u)):
+            reused[u] = parent_functions[u]
+
+    rebuild = [u for u in post_order if u not in reused]
+    return build_node_functions(sg, g, rebuild, bdd, reused), len(rebuild)
+
+
+REORDER_METHODS = ("sift", "none")
+
+
+def build_bdd(sg, bdd=None, ordering="dfs", reorder="sift", reorder_time_limit=None):
+    """ Main function to produce a BDD from a system graph. Returns the BDD and root node as a tuple.
+    If no BDD manager is given, a private one is created for this graph. """
+    bdd, r, _ = build_bdd_with_report(sg, bdd, ordering, reorder, reorder_time_limit)
     return bdd, r
 
 
+def build_bdd_with_report(sg, bdd=None, ordering="dfs", reorder="sift", reorder_time_limit=None, functions=None):
+    """ Builds the BDD and reports its size and timings.
+        - ordering str: static variable ordering heuristic, see variable_ordering.ORDERING_HEURISTICS
+        - reorder str: "sift" to improve the static order with CUDD sifting, "none" to keep it
+        - reorder_time_limit float: seconds allowed for sifting; None means unbounded. Dynamic reordering
+          during construction is disabled when a limit is set, since it cannot be interrupted.
+        - functions dict: if given, receives the BDD of every node reachable from the indicator """
+    if reorder not in REORDER_METHODS:
+        raise ValueError("Unknown reorder method: {}".format(reorder))
+
+    start = time.perf_counter()
+    g, nodes_as_discovered, post_order = prep_for_bdd(sg)
+
+    if bdd is None:
+        bdd = _bdd.BDD(memory_estimate=(int(2**30 * 0.3)))
+    bdd.configure(reordering=(reorder == "sift" and reorder_time_limit is None))
+    bdd.declare(*variable_order(g, nodes_as_discovered, post_order, ordering))
+    memo = build_node_functions(sg, g, post_order, bdd)
+    r = memo["indicator"]
+    if functions is not None:
+        functions.update(memo)
+    built = time.perf_counter()
+    nodes_before_reorder = r.dag_size
+
+    if reorder == "sift":
+        if reorder_time_limit is None:
+            bdd.reorder()
+        else:
+            reorder_with_time_limit(bdd, reorder_time_limit)
+    bdd.configure(reordering=(reorder == "sift"))
+
+    report = {
+        "ordering": ordering,
+        "reorder": reorder,
+        "variables": len(nodes_as_discovered),
+        "nodes_before_reorder": nodes_before_reorder,
+        "nodes": r.dag_size,
+        "build_seconds": built - start,
+        "reorder_seconds": time.perf_counter() - built
+    }
+    return bdd, r, report
+
+
+def reorder_with_time_limit(bdd, seconds, swaps_per_round=None):
+    """ CUDD sifting cannot be interrupted, so it is run in rounds capped by a number of variable swaps,
+    checking the clock between rounds. Stops at the deadline or when a round no longer shrinks the BDD. """
+    deadline = time.perf_counter() + seconds
+    saved = bdd.configure()["max_swaps"]
+    if swaps_per_round is None:
+        swaps_per_round = max(1000, 10 * len(bdd.vars))
+
+    bdd.configure(max_swaps=swaps_per_round)
+    try:
+        size = len(bdd)
+        while time.perf_counter() < deadline:
+            bdd.reorder()
+            if len(bdd) >= size:
+                break
+            size = len(bdd)
+    finally:
+        bdd.configure(max_swaps=saved)
+
+
 def bdd_prob(bdd, f, p, memo):
     """ Recursively evaluate the BDD probability at node f. Follows Shannon expansion as described by Rauzy.
      Note: The BDD here should not be one that has been converted to minimal-cutset-only form.
@@ -0,0 +1,247 @@
+from collections import OrderedDict
+import os
+import time
+
+import dd.cudd as _bdd
+
+from iscram.domain.metrics.bdd_functions import build_bdd_with_report, derive_node_functions
+from iscram.domain.metrics.bdd_cache import BDDDiskCache
+from iscram.domain.metrics.compiled_bdd import compile_bdd, load_compiled_bdd
+
+
+DEFAULT_MEMORY_BUDGET = 2**30
+DEFAULT_INSTANCE_MEMORY = 2**25
+
+# Rough footprint of one live CUDD node including its share of the unique table.
+BYTES_PER_NODE = 40
+
+# Rough footprint of one node of a CompiledBDD: its entries in the numpy arrays plus its row tuple.
+BYTES_PER_COMPILED_NODE = 128
+
+
+class BDDManager:
+    def __init__(self, memory_budget: int = DEFAULT_MEMORY_BUDGET, instance_memory: int = DEFAULT_INSTANCE_MEMORY,
+                 cache_dir: str = None, ordering: str = "dfs", reorder: str = "sift", reorder_time_limit: float = None):
+        """ Process-wide owner of the BDDs of all resident system graphs, keyed by SystemGraph.get_id().
+            - memory_budget int: bytes available to all diagrams together
+            - instance_memory int: memory estimate handed to CUDD for each graph (bounds its cache growth),
+              instead of a fixed 300 MB per graph
+            Each CUDD instance is accounted once, as instance_memory plus BYTES_PER_NODE per node it holds
+            alive, read when the budget is checked; graphs derived in a parent's instance add only the nodes
+            they create, and the node BDDs kept for deriving are included. When the total exceeds the budget
+            the least recently used graphs are released; their CUDD instances are freed once no caller and no
+            resident graph holds their nodes, and they are rebuilt on the next request.
+            Compiled module BDDs shared between graphs (see modules.ModularDecomposition) are kept here too, at
+            BYTES_PER_COMPILED_NODE per node, and are evicted before any graph as they are cheap to rebuild.
+            Otherwise the budget covers CUDD instances only. Flattened or derived structures cached on a SystemGraph
+            (compiled BDD, modules, cutsets, ...) live as long as the graph object and are not evicted here.
+            Graphs do not share one unique table: node names such as x1 are reused across unrelated graphs,
+            and a single variable order serving all of them inflates every diagram. The exception is a graph
+            registered with derive_from: it is built in its parent's manager, reusing the parent's node BDDs. """
+        self.memory_budget = memory_budget
+        self.instance_memory = instance_memory
+        self._graphs = OrderedDict()  # graph id -> (bdd, root)
+        self.disk_cache = BDDDiskCache(cache_dir) if cache_dir is not None else None
+        self.build_options = dict(ordering=ordering, reorder=reorder, reorder_time_limit=reorder_time_limit)
+        self._reports = {}
+        self._functions = {}  # graph id -> node BDDs, kept while the graph is resident so children can derive
+        self._parents = {}  # graph id -> parent SystemGraph
+        self._compiled = {}  # graph id -> CompiledBDD, flattened at most once while the graph is resident
+        self._modules = OrderedDict()  # structural hash of a module -> CompiledBDD
+
+    def derive_from(self, parent, sg):
+        """ Registers sg as a variant of parent with the same nodes, so that its BDD is derived from the parent's
+        node BDDs if those are still resident when sg's BDD is first needed. """
+        if sg.get_id() != parent.get_id():
+            self._parents[sg.get_id()] = parent
+
+    def _derive(self, sg):
+        parent = self._parents.pop(sg.get_id(), None)
+        if parent is None or parent.get_id() not in self._graphs or parent.get_id() not in self._functions:
+            return None
+
+        start = time.perf_counter()
+        bdd, _ = self._graphs[parent.get_id()]
+        functions, rebuilt = derive_node_functions(parent, sg, bdd, self._functions[parent.get_id()])
+        root = functions["indicator"]
+        self._functions[sg.get_id()] = functions
+        self._reports[sg.get_id()] = {
+            "source": "derived", "parent": parent.get_id(), "rebuilt_nodes": rebuilt,
+            "variables": len(bdd.support(root)), "nodes": root.dag_size, "build_seconds": time.perf_counter() - start
+        }
+        return bdd, root
+
+    def get_bdd_with_root(self, sg):
+        key = sg.get_id()
+        if key in self._graphs:
+            self._graphs.move_to_end(key)
+            return self._graphs[key]
+
+        derived = self._derive(sg)
+        if derived is not None:
+            bdd, root = derived
+            self._graphs[key] = (bdd, root)
+            self._save(key)
+            self._evict_over_budget()
+            return bdd, root
+
+        bdd = _bdd.BDD(memory_estimate=self.instance_memory)
+        bdd.configure(reordering=True)
+        cached = self.disk_cache.load(key) if self.disk_cache is not None else None
+        if cached is not None:
+            root = load_compiled_bdd(cached, bdd)
+            self._compiled[key] = cached
+            self._reports[key] = {"source": "disk", "variables": len(cached.var_names), "nodes": root.dag_size}
+            self._graphs[key] = (bdd, root)
+        else:
+            functions = {}
+            bdd, root, report = build_bdd_with_report(sg, bdd=bdd, functions=functions, **self.build_options)
+            self._functions[key] = functions
+            self._reports[key] = dict(source="built", **report)
+            self._graphs[key] = (bdd, root)
+            self._save(key)
+
+        self._evict_over_budget()
+        return bdd, root
+
+    def get_node_functions(self, sg):
+        """ The CUDD manager of sg and the BDD of every node reachable from the indicator, as kept from building or
+        deriving sg's BDD; None when the BDD was loaded from the disk cache, which holds the root only. """
+        bdd, _ = self.get_bdd_with_root(sg)
+        functions = self._functions.get(sg.get_id())
+        return None if functions is None else (bdd, functions)
+
+    def get_compiled_bdd(self, sg):
+        """ The compiled BDD of a resident graph is flattened once and shared with the disk cache; otherwise it is
+        read straight from the disk cache when possible, without touching CUDD. """
+        key = sg.get_id()
+        if key not in self._graphs and self.disk_cache is not None:
+            cached = self.disk_cache.load(key)
+            if cached is not None:
+                return cached
+        self.get_bdd_with_root(sg)
+        return self._compiled_bdd(key)
+
+    def _compiled_bdd(self, key):
+        if key not in self._compiled:
+            self._compiled[key] = compile_bdd(*self._graphs[key])
+        return self._compiled[key]
+
+    def _save(self, key):
+        if self.disk_cache is None:
+            return
+        try:
+            self.disk_cache.save(key, self._compiled_bdd(key))
+        except OSError:
+            pass  # The cache is an optimization; a read-only or full disk must not fail the request.
+
+    def get_module(self, key: str):
+        """ The compiled BDD of a module with this structural hash, or None. """
+        if key not in self._modules:
+            return None
+        self._modules.move_to_end(key)
+        return self._modules[key]
+
+    def put_module(self, key: str, cbdd):
+        self._modules[key] = cbdd
+        self._modules.move_to_end(key)
+        self._evict_over_budget()
+
+    def report(self, key: str):
+        """ How the most recent BDD for this graph was obtained: size, ordering and timings. """
+        return self._reports.get(key)
+
+    def _forget(self, key: str):
+        """ Drops the compiled BDD and what is kept for deriving from or into this graph, including registrations of
+        its variants, which could no longer be derived from it. """
+        self._functions.pop(key, None)
+        self._compiled.pop(key, None)
+        self._parents.pop(key, None)
+        for child in [c for c, parent in self._parents.items() if parent.get_id() == key]:
+            del self._parents[child]
+
+    def release(self, key: str):
+        if key in self._graphs:
+            del self._graphs[key]
+        self._forget(key)
+
+    def clear(self):
+        self._graphs.clear()
+        self._functions.clear()
+        self._compiled.clear()
+        self._parents.clear()
+        self._modules.clear()
+
+    def __contains__(self, key):
+        return key in self._graphs
+
+    def _instances(self):
+        """ The distinct CUDD instances of resident graphs; a derived graph shares its parent's. """
+        return list({id(bdd): bdd for bdd, _ in self._graphs.values()}.values())
+
+    def node_count(self, key: str = None) -> int:
+        """ Live nodes of the CUDD instance holding the graph's BDD, or of all instances. """
+        if key is not None:
+            return len(self._graphs[key][0]) if key in self._graphs else 0
+        return sum(len(bdd) for bdd in self._instances())
+
+    def module_memory(self) -> int:
+        return sum(len(cbdd) for cbdd in self._modules.values()) * BYTES_PER_COMPILED_NODE
+
+    def memory_used(self) -> int:
+        return (len(self._instances()) * self.instance_memory + self.node_count() * BYTES_PER_NODE +
+                self.module_memory())
+
+    def _evict_over_budget(self):
+        while self._modules and self.memory_used() > self.memory_budget:
+            self._modules.popitem(last=False)
+        # The most recently used graph is always kept, even if it alone exceeds the budget.
+        while len(self._graphs) > 1 and self.memory_used() > self.memory_budget:
+            evicted, _ = self._graphs.popitem(last=False)
+            self._forget(evicted)
+
+    def statistics(self):
+        return {
+            "graphs": len(self._graphs),
+            "instances": len(self._instances()),
+            "modules": len(self._modules),
+            "nodes": self.node_count(),
+            "memory_used": self.memory_used(),
+            "memory_budget": self.memory_budget
+        }
+
+
+_manager = None
+
+
+def configure_bdd_manager(memory_budget: int = None, instance_memory: int = None, cache_dir: str = None,
+                          ordering: str = None, reorder: str = None, reorder_time_limit: float = None) -> BDDManager:
+    """ Replaces the process-wide manager. Unset values fall back to the ISCRAM_BDD_MEMORY_BUDGET,
+    ISCRAM_BDD_INSTANCE_MEMORY (bytes), ISCRAM_BDD_CACHE_DIR, ISCRAM_BDD_ORDERING, ISCRAM_BDD_REORDER and
+    ISCRAM_BDD_REORDER_TIME_LIMIT (seconds) environment variables, then to the defaults.
+    The disk cache is disabled unless a directory is configured. """
+    global _manager
+
+    if memory_budget is None:
+        memory_budget = int(os.environ.get("ISCRAM_BDD_MEMORY_BUDGET", DEFAULT_MEMORY_BUDGET))
+    if instance_memory is None:
+        instance_memory = int(os.environ.get("ISCRAM_BDD_INSTANCE_MEMORY", DEFAULT_INSTANCE_MEMORY))
+
+    if cache_dir is None:
+        cache_dir = os.environ.get("ISCRAM_BDD_CACHE_DIR")
+
+    if ordering is None:
+        ordering = os.environ.get("ISCRAM_BDD_ORDERING", "dfs")
+    if reorder is None:
+        reorder = os.environ.get("ISCRAM_BDD_REORDER", "sift")
+    if reorder_time_limit is None and "ISCRAM_BDD_REORDER_TIME_LIMIT" in os.environ:
+        reorder_time_limit = float(os.environ["ISCRAM_BDD_REORDER_TIME_LIMIT"])
+
+    _manager = BDDManager(memory_budget, instance_memory, cache_dir, ordering, reorder, reorder_time_limit)
+    return _manager
+
+
+def get_bdd_manager() -> BDDManager:
+    if _manager is None:
+        return configure_bdd_manager()
+    return _manager
@@ -0,0 +1,234 @@
+import numpy as np
+
+
+class CompiledBDD:
+    def __init__(self, var_names, var, high, low, low_negated, root, root_negated):
+        """ A BDD flattened into topologically ordered arrays, independent of the BDD manager it came from.
+                   - var_names list of str: variable names, ordered by BDD level at compile time
+                   - var int array: index into var_names for each node (-1 for the terminal)
+                   - high, low int arrays: index of the then/else child of each node
+                   - low_negated bool array: True where the else edge is complemented
+                   - root int, root_negated bool: the function itself
+               Node 0 is the TRUE terminal; every node appears after both of its children.
+               CUDD never complements the then edge, so only the else edge carries a flag. """
+        self.var_names = list(var_names)
+        self.var = np.asarray(var, dtype=np.int64)
+        self.high = np.asarray(high, dtype=np.int64)
+        self.low = np.asarray(low, dtype=np.int64)
+        self.low_negated = np.asarray(low_negated, dtype=bool)
+        self.root = int(root)
+        self.root_negated = bool(root_negated)
+
+        # Plain lists are much faster than numpy scalars inside the Python-level sweep.
+        self._rows = list(zip(self.var.tolist(), self.high.tolist(), self.low.tolist(), self.low_negated.tolist()))
+        self._layers = None
+
+    def __len__(self):
+        return len(self.var)
+
+    def prob_vector(self, p):
+        """ Orders a {variable: probability} dictionary to match var_names. """
+        return [p[v] for v in self.var_names]
+
+    def prob_matrix(self, P, variables):
+        """ Reorders the columns of a (scenarios x len(variables)) matrix to match var_names. """
+        column = {v: j for j, v in enumerate(variables)}
+        P = np.asarray(P, dtype=np.float64)
+        return P[:, [column[v] for v in self.var_names]]
+
+    @property
+    def layers(self):
+        """ Node indices grouped by height above the terminal. Nodes in one layer never depend on each other,
+        so each layer can be evaluated with a single vectorized expression. """
+        if self._layers is None:
+            height = [0] * len(self)
+            for k in range(1, len(self)):
+                _, h, lo, _ = self._rows[k]
+                height[k] = 1 + max(height[h], height[lo])
+            height = np.asarray(height)
+            order = np.argsort(height, kind="stable")
+            bounds = np.searchsorted(height[order], np.arange(1, height.max() + 2))
+            self._layers = [order[bounds[i]:bounds[i+1]] for i in range(len(bounds) - 1)]
+        return self._layers
+
+
+def _regular_id(f):
+    return int(~f) if f.negated else int(f)
+
+
+def compile_bdd(bdd, root) -> CompiledBDD:
+    """ Flattens the BDD rooted at root with an iterative post-order walk, so children always precede parents. """
+    cbdd, _ = compile_bdd_roots(bdd, [root])
+    return cbdd
+
+
+def compile_bdd_roots(bdd, roots):
+    """ Flattens several functions of one manager together, so their shared nodes appear once. Returns the
+    compiled BDD, whose root is the first function, and the (index, negated) pair of every function. """
+    support = set()
+    for root in roots:
+        support |= bdd.support(root)
+    var_names = sorted(support, key=bdd.level_of_var)
+    var_index = {v: i for i, v in enumerate(var_names)}
+
+    index = {_regular_id(bdd.true): 0}
+    var, high, low, low_negated = [-1], [0], [0], [False]
+
+    stack = [(root, False) for root in reversed(roots)]
+    while stack:
+        f, expanded = stack.pop()
+        key = _regular_id(f)
+        if key in index:
+            continue
+        if expanded:
+            index[key] = len(var)
+            var.append(var_index[f.var])
+            high.append(index[_regular_id(f.high)])
+            low.append(index[_regular_id(f.low)])
+            low_negated.append(f.low.negated)
+        else:
+            stack.append((f, True))
+            stack.append((f.low, False))
+            stack.append((f.high, False))
+
+    functions = [(index[_regular_id(root)], root.negated) for root in roots]
+    cbdd = CompiledBDD(var_names, var, high, low, low_negated, functions[0][0], functions[0][1])
+    return cbdd, functions
+
+
+def _forward(cbdd: CompiledBDD, x):
+    """ Probability of every node, children first, by Shannon expansion. """
+    prob = [1] * len(cbdd)
+
+    for k in range(1, len(cbdd)):
+        v, h, lo, lo_negated = cbdd._rows[k]
+        g = prob[lo]
+        if lo_negated:
+            g = 1 - g
+        prob[k] = x[v] * prob[h] + (1 - x[v]) * g
+
+    return prob
+
+
+def _root_prob(cbdd: CompiledBDD, prob):
+    r = prob[cbdd.root]
+    return 1 - r if cbdd.root_negated else r
+
+
+def compiled_bdd_prob(cbdd: CompiledBDD, p) -> float:
+    """ Evaluates the probability of a compiled BDD with a single bottom-up sweep. """
+    return _root_prob(cbdd, _forward(cbdd, cbdd.prob_vector(p)))
+
+
+def compiled_bdd_prob_batch(cbdd: CompiledBDD, P, max_cells=2**24) -> np.ndarray:
+    """ Evaluates many probability vectors at once. P is (scenarios x variables) with columns ordered as
+    cbdd.var_names; returns one probability per scenario. Scenarios are processed in chunks so that the
+    (nodes x scenarios) working array stays below max_cells entries. """
+    P = np.asarray(P, dtype=np.float64)
+    if P.ndim != 2 or P.shape[1] != len(cbdd.var_names):
+        raise ValueError("Expected a matrix with {} columns.".format(len(cbdd.var_names)))
+
+    chunk = max(1, max_cells // len(cbdd))
+    results = [_prob_batch(cbdd, P[i:i + chunk]) for i in range(0, P.shape[0], chunk)]
+    return np.concatenate(results) if results else np.zeros(0)
+
+
+def _forward_batch(cbdd: CompiledBDD, X):
+    """ Probability of every node for each column of X, a (variables x scenarios) matrix, one layer at a time. """
+    prob = np.ones((len(cbdd), X.shape[1]))
+
+    for idx in cbdd.layers:
+        x = X[cbdd.var[idx]]
+        g = prob[cbdd.low[idx]]
+        g = np.where(cbdd.low_negated[idx, None], 1 - g, g)
+        prob[idx] = x * prob[cbdd.high[idx]] + (1 - x) * g
+
+    return prob
+
+
+def _prob_batch(cbdd: CompiledBDD, P) -> np.ndarray:
+    return _root_prob(cbdd, _forward_batch(cbdd, P.T))
+
+
+def compiled_bdd_gradient(cbdd: CompiledBDD, p):
+    """ Returns the probability of the compiled BDD and its partial derivative with respect to each variable
+    (ordered as cbdd.var_names), using one forward and one backward sweep. Since the probability is multilinear,
+    each partial derivative equals the Birnbaum importance P(f | x=1) - P(f | x=0). """
+    x = cbdd.prob_vector(p)
+    prob = _forward(cbdd, x)
+    return _root_prob(cbdd, prob), _backward(cbdd, x, prob)
+
+
+def _backward(cbdd: CompiledBDD, x, prob):
+    """ Partial derivative of the root probability with respect to each variable, given the node probabilities. """
+    n = len(cbdd)
+    # adjoint[k] holds d(result) / d(prob[k]); parents always have larger indices than their children.
+    adjoint = [0] * n
+    adjoint[cbdd.root] = -1 if cbdd.root_negated else 1
+    grad = [0.0] * len(cbdd.var_names)
+
+    for k in range(n - 1, 0, -1):
+        a = adjoint[k]
+        if a == 0:
+            continue
+        v, h, lo, lo_negated = cbdd._rows[k]
+        g = prob[lo]
+        if lo_negated:
+            g = 1 - g
+        grad[v] += a * (prob[h] - g)
+        adjoint[h] += a * x[v]
+        adjoint[lo] += -a * (1 - x[v]) if lo_negated else a * (1 - x[v])
+
+    return grad
+
+
+def compiled_bdd_gradient_batch(cbdd: CompiledBDD, P, max_cells=2**23):
+    """ Batched form of compiled_bdd_gradient. Returns (probabilities, gradients) with shapes (scenarios,)
+    and (scenarios x variables). """
+    P = np.asarray(P, dtype=np.float64)
+    if P.ndim != 2 or P.shape[1] != len(cbdd.var_names):
+        raise ValueError("Expected a matrix with {} columns.".format(len(cbdd.var_names)))
+
+    chunk = max(1, max_cells // len(cbdd))
+    results = [_gradient_batch(cbdd, P[i:i + chunk]) for i in range(0, P.shape[0], chunk)]
+    if not results:
+        return np.zeros(0), np.zeros((0, len(cbdd.var_names)))
+    return np.concatenate([r for r, _ in results]), np.concatenate([g for _, g in results])
+
+
+def _gradient_batch(cbdd: CompiledBDD, P):
+    X = P.T
+    prob = _forward_batch(cbdd, X)
+
+    adjoint = np.zeros_like(prob)
+    adjoint[cbdd.root] = -1 if cbdd.root_negated else 1
+    grad = np.zeros_like(X)
+
+    for idx in reversed(cbdd.layers):
+        a = adjoint[idx]
+        x = X[cbdd.var[idx]]
+        g = prob[cbdd.low[idx]]
+        negated = cbdd.low_negated[idx, None]
+        g = np.where(negated, 1 - g, g)
+        np.add.at(grad, cbdd.var[idx], a * (prob[cbdd.high[idx]] - g))
+        np.add.at(adjoint, cbdd.high[idx], a * x)
+        np.add.at(adjoint, cbdd.low[idx], np.where(negated, -a, a) * (1 - x))
+
+    return _root_prob(cbdd, prob), grad.T
+
+
+def load_compiled_bdd(cbdd: CompiledBDD, bdd):
+    """ Rebuilds the CUDD function of a compiled BDD in a fresh manager, declaring variables in the compiled
+    order so every node can be added directly without reordering or apply operations. """
+    bdd.configure(reordering=False)
+    bdd.declare(*cbdd.var_names)
+
+    nodes = [bdd.true]
+    for k in range(1, len(cbdd)):
+        v, h, lo, lo_negated = cbdd._rows[k]
+        low = ~nodes[lo] if lo_negated else nodes[lo]
+        nodes.append(bdd.find_or_add(cbdd.var_names[v], low, nodes[h]))
+
+    bdd.configure(reordering=True)
+    root = nodes[cbdd.root]
+    return ~root if cbdd.root_negated else root
@@ -1,10 +1,13 @@
 from typing import FrozenSet, List, Set, Dict
 from collections import deque
 
+import heapq
 import math
 
 from iscram.domain.model import SystemGraph
 from iscram.domain.metrics.bdd_functions import build_bdd
+from iscram.domain.metrics.cutset_zdd import minimal_cutsets
+from iscram.domain.metrics.cutset_probability import CutsetMatrix
 
 
 def prep_for_mocus(sg: SystemGraph, ignore_suppliers):
@@ -67,14 +70,17 @@ def prep_for_mocus(sg: SystemGraph, ignore_suppliers):
 
 
 def find_minimal_cutsets(sg: SystemGraph, ignore_suppliers=False) -> FrozenSet[FrozenSet[str]]:
-    return mocus(sg, ignore_suppliers)
+    """ Materializes the minimal cutsets computed as a ZDD from the BDD. Use minimal_cutsets directly to count,
+    evaluate or iterate over large families without building Python sets. """
+    return minimal_cutsets(sg, ignore_suppliers).to_frozensets()
 
 
 def mocus(sg: SystemGraph, ignore_suppliers=False) -> FrozenSet[FrozenSet[str]]:
     """ Inefficient implementation of MOCUS.
     Gates are added to connect suppliers and components and their dependencies.
     Minimal cutsets including these gates can safely be deleted since the probability of gate failure is zero.
-    This function and the use of cutsets in general is deprecated in favor of BDD based functions.
+    This function and the use of cutsets in general is deprecated in favor of BDD based functions;
+    find_minimal_cutsets uses the ZDD engine in cutset_zdd instead.
     """
 
     graph, logic = prep_for_mocus(sg, ignore_suppliers)
@@ -88,6 +94,122 @@ def mocus(sg: SystemGraph, ignore_suppliers=False) -> FrozenSet[FrozenSet[str]]:
     return frozenset(working_result)
 
 
+def truncated_mocus(sg: SystemGraph, ignore_suppliers=False, p=None, max_order=None,
+                    min_probability=None) -> FrozenSet[FrozenSet[str]]:
+    """ MOCUS over integer bitsets, keeping only minimal cutsets of at most max_order nodes with a probability
+    (under p) of at least min_probability. Working cutsets are expanded smallest first; a working cutset is
+    dropped as soon as it exceeds a cutoff or contains a cutset already found, and finished cutsets are
+    minimized on the fly with an index keyed by their lowest node. """
+    if min_probability is not None and p is None:
+        raise ValueError("A probability cutoff requires probabilities p.")
+
+    graph, logic = prep_for_mocus(sg, ignore_suppliers)
+    events = sorted(n for n in sg.nodes if n != "indicator")
+    bit = {u: 1 << i for i, u in enumerate(events)}
+    prob = {u: p[u] for u in events} if p is not None else None
+
+    # Gates are expanded parents first, so a gate shared by several branches is expanded once per cutset.
+    post_order, visited = [], set()
+    stack = [("indicator", False)]
+    while stack:
+        u, expanded = stack.pop()
+        if expanded:
+            post_order.append(u)
+        elif u not in visited:
+            visited.add(u)
+            stack.append((u, True))
+            stack.extend((c, False) for c in sorted(graph.get(u, ())))
+    rank = {u: -i for i, u in enumerate(post_order)}
+
+    # Nodes below each gate, and their highest probability, bound what a pending gate can still add.
+    below, best = {}, {}
+    for u in post_order:
+        children = graph.get(u, ())
+        below[u] = bit.get(u, 0)
+        best[u] = prob[u] if prob is not None and u in bit else 0.0
+        for c in children:
+            below[u] |= below[c]
+            best[u] = max(best[u], best[c])
+
+    found = set()
+    by_lowest = {}
+
+    def lowest(bits):
+        return bits & -bits
+
+    def subsumed(bits):
+        rest = bits
+        while rest:
+            low = lowest(rest)
+            rest ^= low
+            for c in by_lowest.get(low, ()):
+                if c & ~bits == 0:
+                    return True
+        return False
+
+    def add(bits):
+        for c in [c for c in found if bits & ~c == 0]:
+            found.discard(c)
+            by_lowest[lowest(c)].discard(c)
+        found.add(bits)
+        by_lowest.setdefault(lowest(bits), set()).add(bits)
+
+    def extend(bits, gates, q, children):
+        gates = set(gates)
+        for c in children:
+            if graph.get(c):
+                gates.add(c)
+            elif is_fictive(c):
+                return None  # an empty fictive gate never fails
+            elif not bits & bit[c]:
+                bits |= bit[c]
+                q = q * prob[c] if prob is not None else q
+        return bits, frozenset(gates), q
+
+    def within_cutoffs(bits, gates, q):
+        # A pending gate with no node in common with bits adds at least one new node to every completion.
+        disjoint = [g for g in gates if not below[g] & bits]
+        order = bin(bits).count("1") + (1 if disjoint else 0)
+        if max_order is not None and order > max_order:
+            return False
+        if min_probability is not None and prob is not None:
+            return q * min((best[g] for g in disjoint), default=1.0) >= min_probability
+        return True
+
+    counter = 0
+    heap = [(1, counter, 0, frozenset(["indicator"]), 1.0)]
+    seen = set()
+    while heap:
+        _, _, bits, gates, q = heapq.heappop(heap)
+        if subsumed(bits):
+            continue
+        if not gates:
+            add(bits)
+            continue
+
+        v = min(gates, key=rank.get)
+        rest = gates - {v}
+        options = []
+        if v != "indicator" and not is_fictive(v):
+            kept = q * prob[v] if prob is not None and not bits & bit[v] else q
+            options.append((bits | bit[v], rest, kept))
+        if logic[v] == "and":
+            options.append(extend(bits, rest, q, graph[v]))
+        else:
+            options.extend(extend(bits, rest, q, [c]) for c in graph[v])
+
+        for option in options:
+            if option is None or (option[0], option[1]) in seen or not within_cutoffs(*option):
+                continue
+            if subsumed(option[0]):
+                continue
+            seen.add((option[0], option[1]))
+            counter += 1
+            heapq.heappush(heap, (bin(option[0]).count("1") + len(option[1]), counter) + option)
+
+    return frozenset(frozenset(u for u in events if bits & bit[u]) for bits in found)
+
+
 def iterative_mocus(n: str, graph: Dict, logic: Dict) -> List[Set]:
     queue = deque([n])
     root_cutset = {"indicator"}
@@ -143,8 +265,9 @@ def probability_union(x):
 
 
 def probability_any_cutset(cutsets, x):
-    probability_each_cutset = map(lambda ct: math.prod([x[i] for i in ct]), cutsets)
-    return probability_union(probability_each_cutset)
+    """ Min-cut upper bound of the risk, 1 - prod(1 - P(C)), treating cutsets as independent. """
+    matrix = CutsetMatrix(cutsets)
+    return matrix.min_cut_upper_bound(matrix.prob_vector(x))
 
 
 def minimize_cutsets(cutsets: List[FrozenSet]):
@@ -0,0 +1,136 @@
+from functools import cached_property
+
+import numpy as np
+
+
+class CutsetMatrix:
+    def __init__(self, cutsets, variables=None):
+        """ Minimal cutsets stored as a sparse (cutsets x variables) incidence matrix in CSR form.
+            - cutsets iterable of sets of node ids, e.g. a frozenset of frozensets or a MinimalCutsets
+            - variables list of str: column order; defaults to the sorted nodes appearing in any cutset
+            All bounds accept one probability vector (ordered as variables) or a (scenarios x variables)
+            matrix, and return a float or one value per scenario accordingly. """
+        cutsets = [sorted(c) for c in cutsets]
+        if variables is None:
+            variables = sorted(set(u for c in cutsets for u in c))
+        self.variables = list(variables)
+        column = {v: j for j, v in enumerate(self.variables)}
+
+        self.indptr = np.zeros(len(cutsets) + 1, dtype=np.int64)
+        self.indptr[1:] = np.cumsum([len(c) for c in cutsets])
+        self.indices = np.asarray([column[u] for c in cutsets for u in c], dtype=np.int64)
+        if len(cutsets) > 0 and np.any(np.diff(self.indptr) == 0):
+            raise ValueError("Cutsets must not be empty.")
+
+    def __len__(self):
+        return len(self.indptr) - 1
+
+    def prob_vector(self, p):
+        """ Orders a {node: probability} dictionary to match variables. """
+        return np.asarray([p[v] for v in self.variables], dtype=np.float64)
+
+    def cutset_probabilities(self, P) -> np.ndarray:
+        """ Probability of each cutset, with shape (scenarios x cutsets). """
+        P = np.atleast_2d(np.asarray(P, dtype=np.float64))
+        if len(self) == 0:
+            return np.zeros((P.shape[0], 0))
+        return np.multiply.reduceat(P[:, self.indices], self.indptr[:-1], axis=1)
+
+    def rare_event(self, P):
+        """ Sum of the cutset probabilities, accurate when probabilities are small. """
+        return _shape_like(P, self.cutset_probabilities(P).sum(axis=1))
+
+    def min_cut_upper_bound(self, P):
+        """ 1 - prod(1 - P(C)) over cutsets, an upper bound of the risk of a coherent system. """
+        Q = self.cutset_probabilities(P)
+        return _shape_like(P, 1 - np.prod(1 - Q, axis=1))
+
+    def shared_variable_pairs(self) -> int:
+        """ Number of (pair of cutsets, shared variable) triples, the work and memory of pairwise_sum. It is
+        counted from the column sizes alone, without listing the pairs. """
+        counts = np.bincount(self.indices, minlength=len(self.variables)).astype(np.int64)
+        return int((counts * (counts - 1) // 2).sum())
+
+    @cached_property
+    def _overlaps(self):
+        """ Pairs of cutsets that share variables, from the cutsets containing each variable. Returns the first
+        and second cutset of every such pair, the shared variables of all pairs concatenated, and the offset of
+        each pair's variables in that array. """
+        rows = np.repeat(np.arange(len(self)), np.diff(self.indptr))
+        order = np.argsort(self.indices, kind="stable")
+        columns = np.split(rows[order], np.cumsum(np.bincount(self.indices, minlength=len(self.variables)))[:-1])
+
+        first, second, shared = [], [], []
+        for j, members in enumerate(columns):
+            if len(members) < 2:
+                continue
+            a, b = np.triu_indices(len(members), k=1)
+            first.append(members[a])
+            second.append(members[b])
+            shared.append(np.full(len(a), j, dtype=np.int64))
+
+        if not first:
+            empty = np.zeros(0, dtype=np.int64)
+            return empty, empty, empty, empty
+
+        first, second, shared = np.concatenate(first), np.concatenate(second), np.concatenate(shared)
+        key = first * len(self) + second
+        order = np.argsort(key, kind="stable")
+        key, shared = key[order], shared[order]
+        starts = np.flatnonzero(np.r_[True, key[1:] != key[:-1]])
+        return key[starts] // len(self), key[starts] % len(self), shared, starts
+
+    def pairwise_sum(self, P, max_cells=2**24):
+        """ Second Bonferroni term: the sum over pairs of cutsets of the probability that both fail, i.e. the
+        product over their union. Disjoint cutsets fail independently, so all pairs together contribute
+        ((sum P(Ci))^2 - sum P(Ci)^2) / 2; only pairs sharing variables need a correction, P(Ci)P(Cj) divided
+        by the product over the shared variables, taken in log space. Those pairs come from the cutsets
+        containing each variable, so the cost grows with shared_variable_pairs rather than the square of the
+        number of cutsets. Raises ValueError when shared_variable_pairs exceeds max_cells. """
+        if self.shared_variable_pairs() > max_cells:
+            raise ValueError("Too many overlapping cutset pairs for the pairwise sum.")
+        P = np.atleast_2d(np.asarray(P, dtype=np.float64))
+        Q = self.cutset_probabilities(P)
+        s1 = Q.sum(axis=1)
+        result = (s1 * s1 - (Q * Q).sum(axis=1)) / 2
+
+        first, second, shared, starts = self._overlaps
+        if len(first) == 0:
+            return _shape_like(P, result)
+
+        chunk = max(1, max_cells // len(shared))
+        for start in range(0, P.shape[0], chunk):
+            block = P[start:start + chunk]
+            Qb = Q[start:start + chunk]
+            log_p = np.log(np.where(block > 0, block, 1.0))
+            log_q = np.log(np.where(Qb > 0, Qb, 1.0))
+            log_shared = np.add.reduceat(log_p[:, shared], starts, axis=1)
+            possible = (Qb[:, first] > 0) & (Qb[:, second] > 0)
+            both = np.where(possible, np.exp(log_q[:, first] + log_q[:, second] - log_shared), 0.0)
+            result[start:start + chunk] += (both - Qb[:, first] * Qb[:, second]).sum(axis=1)
+        return _shape_like(P, result)
+
+    def bounds(self, P, pairwise=True, max_cells=2**24):
+        """ Risk bands from the cutsets: the rare-event approximation, the min-cut upper bound and
+        inclusion-exclusion truncated after pairs, S1 - S2 <= risk <= min(S1, min-cut upper bound). The upper
+        bounds cost one pass over the cutsets. The pairwise term S2 is skipped when pairwise is False or when it
+        would exceed max_cells (see pairwise_sum); the lower bound is then the largest cutset probability. """
+        Q = self.cutset_probabilities(P)
+        s1 = Q.sum(axis=1)
+        mcub = 1 - np.prod(1 - Q, axis=1)
+        largest = Q.max(axis=1) if Q.shape[1] > 0 else np.zeros(Q.shape[0])
+        lower = largest
+        if pairwise and self.shared_variable_pairs() <= max_cells:
+            s2 = np.atleast_1d(self.pairwise_sum(P, max_cells))
+            lower = np.maximum(s1 - s2, largest)
+        return {
+            "rare_event": _shape_like(P, s1),
+            "min_cut_upper_bound": _shape_like(P, mcub),
+            "lower": _shape_like(P, lower),
+            "upper": _shape_like(P, np.minimum(np.minimum(s1, mcub), 1.0))
+        }
+
+
+def _shape_like(P, values):
+    """ A float for a single probability vector, otherwise one value per scenario. """
+    return float(values[0]) if np.ndim(P) == 1 else values
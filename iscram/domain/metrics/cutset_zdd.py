@@ -0,0 +1,228 @@
+import heapq
+import itertools
+import math
+
+import dd.cudd as _bdd
+import dd.cudd_zdd as _zdd
+
+from iscram.domain.metrics.bdd_functions import build_sg_graph_dict, dependency_orders, build_node_functions
+from iscram.domain.metrics.compiled_bdd import CompiledBDD, compile_bdd
+
+
+def _level(f):
+    return math.inf if f.var is None else f.level
+
+
+def without(zdd, P, Q, memo=None):
+    """ Sets of the family P that contain no set of the family Q (Rauzy's "without" operation).
+    Iterative, so that deep diagrams do not exhaust the Python stack. The memo maps pairs of node ids to
+    (P, Q, result) so the operands stay referenced and their ids cannot be reused while memoized. """
+    if memo is None:
+        memo = {}
+    empty, base = zdd.false, zdd.true_node
+
+    stack = [[P, Q, 0, None]]
+    ret = None
+    while stack:
+        frame = stack[-1]
+        P, Q, stage, saved = frame
+        if stage == 0:
+            ret = None
+            if Q == empty:
+                ret = P
+            elif P == empty or Q == base or P == Q:
+                ret = empty
+            elif (int(P), int(Q)) in memo:
+                ret = memo[(int(P), int(Q))][2]
+            if ret is not None:
+                stack.pop()
+                continue
+
+            lp, lq = _level(P), _level(Q)
+            if lq < lp:
+                # No set of P contains Q's top variable, so only the sets of Q without it matter.
+                frame[2] = 1
+                stack.append([P, Q.low, 0, None])
+            elif lp < lq:
+                frame[2] = 2
+                stack.append([P.high, Q, 0, None])
+            else:
+                frame[2] = 4
+                stack.append([P.high, Q.low, 0, None])
+            continue
+
+        if stage == 2:
+            frame[2], frame[3] = 3, ret
+            stack.append([P.low, Q, 0, None])
+            continue
+        if stage == 4:
+            frame[2] = 5
+            stack.append([ret, Q.high, 0, None])
+            continue
+        if stage == 5:
+            frame[2], frame[3] = 6, ret
+            stack.append([P.low, Q.low, 0, None])
+            continue
+
+        if stage in (3, 6):
+            ret = zdd.find_or_add(P.var, ret, saved)
+        memo[(int(P), int(Q))] = (P, Q, ret)
+        stack.pop()
+
+    return ret
+
+
+def minsol(cbdd: CompiledBDD, zdd):
+    """ Minimal solutions of a compiled BDD as a ZDD, by Rauzy's algorithm:
+    minsol(ite(x, F1, F0)) = minsol(F0) | x . without(minsol(F1), minsol(F0)).
+    Complemented sub-functions are handled as separate (node, negated) states. The ZDD must declare
+    cbdd.var_names in the same order. """
+    n = len(cbdd)
+    needed = [[False, False] for _ in range(n)]
+    needed[cbdd.root][cbdd.root_negated] = True
+    for k in range(n - 1, 0, -1):
+        v, h, lo, lo_negated = cbdd._rows[k]
+        for neg in (False, True):
+            if needed[k][neg]:
+                needed[h][neg] = True
+                needed[lo][neg ^ lo_negated] = True
+
+    result = {(0, False): zdd.true_node, (0, True): zdd.false}
+    memo = {}
+    for k in range(1, n):
+        v, h, lo, lo_negated = cbdd._rows[k]
+        for neg in (False, True):
+            if needed[k][neg]:
+                k0 = result[(lo, neg ^ lo_negated)]
+                k1 = without(zdd, result[(h, neg)], k0, memo)
+                result[(k, neg)] = zdd.find_or_add(cbdd.var_names[v], k0, k1)
+
+    return result[(cbdd.root, cbdd.root_negated)]
+
+
+class MinimalCutsets:
+    def __init__(self, zdd, root):
+        """ A family of minimal cutsets stored as a ZDD.
+            - zdd ZDD: the manager, with reordering disabled
+            - root Function: the family
+            Counting and probabilities are computed on the shared diagram; iteration yields one cutset
+            at a time, so large families never have to be held as Python sets. """
+        self.zdd = zdd
+        self.root = root
+
+    def __len__(self):
+        return self.count()
+
+    def count(self) -> int:
+        return self._sweep(0, 1, lambda var, low, high: low + high)
+
+    def __iter__(self):
+        stack = [(self.root, ())]
+        while stack:
+            f, chosen = stack.pop()
+            if f == self.zdd.false:
+                continue
+            if f == self.zdd.true_node:
+                yield frozenset(chosen)
+                continue
+            stack.append((f.low, chosen))
+            stack.append((f.high, chosen + (f.var,)))
+
+    def _sweep(self, empty_value, base_value, combine, values=None):
+        """ Evaluates every node of the family once, children first. empty_value and base_value are the values
+        of the empty family and of the family holding only the empty set. Node values are left in values, keyed
+        by node id; the ids stay valid while the root holds its nodes. """
+        if values is None:
+            values = {}
+        values[int(self.zdd.false)] = empty_value
+        values[int(self.zdd.true_node)] = base_value
+        stack = [(self.root, False)]
+        while stack:
+            f, expanded = stack.pop()
+            if int(f) in values:
+                continue
+            if expanded:
+                values[int(f)] = combine(f.var, values[int(f.low)], values[int(f.high)])
+            else:
+                stack.extend([(f, True), (f.low, False), (f.high, False)])
+        return values[int(self.root)]
+
+    def rare_event_probability(self, p) -> float:
+        """ Sum over cutsets of the product of their probabilities, an upper bound of the system risk that is
+        accurate when probabilities are small. """
+        return self._sweep(0.0, 1.0, lambda var, low, high: low + p[var] * high)
+
+    def most_probable(self, p):
+        """ Yields (cutset, probability) pairs in order of decreasing probability. A first sweep gives the best
+        probability reachable below every node, an exact heuristic for a best-first search, so every cutset
+        is found by following a single path and the work is proportional to the number of cutsets taken. """
+        best = {int(self.zdd.false): 0.0, int(self.zdd.true_node): 1.0}
+
+        def combine(var, low, high):
+            return max(low, p[var] * high)
+        self._sweep(0.0, 1.0, combine, best)
+
+        counter = 0
+        heap = [(-best[int(self.root)], counter, 1.0, self.root, None)]
+        while heap:
+            priority, _, weight, f, chosen = heapq.heappop(heap)
+            if priority == 0:
+                return
+            if f == self.zdd.true_node:
+                cutset = []
+                while chosen is not None:
+                    var, chosen = chosen
+                    cutset.append(var)
+                yield frozenset(cutset), weight
+                continue
+            for child, child_weight, child_chosen in ((f.low, weight, chosen),
+                                                       (f.high, weight * p[f.var], (f.var, chosen))):
+                counter += 1
+                heapq.heappush(heap, (-child_weight * best[int(child)], counter, child_weight, child, child_chosen))
+
+    def order_counts(self):
+        """ Number of cutsets of each size, as a list indexed by size. """
+        def combine(var, low, high):
+            counts = list(low) + [0] * (len(high) + 1 - len(low))
+            for i, c in enumerate(high):
+                counts[i + 1] += c
+            return counts
+        return self._sweep([], [1], combine)
+
+    def to_frozensets(self):
+        return frozenset(self)
+
+    def top(self, p, k: int):
+        """ The k most probable cutsets with their probabilities. """
+        return list(itertools.islice(self.most_probable(p), k))
+
+
+def system_function(sg, ignore_suppliers=False) -> CompiledBDD:
+    """ The compiled system function, optionally with every supplier dependency removed. """
+    if not ignore_suppliers:
+        return sg.get_compiled_bdd()
+
+    g = build_sg_graph_dict(sg)
+    for deps in g.values():
+        deps.pop("supplier", None)
+    discovered, post_order = dependency_orders(g, "indicator")
+
+    bdd = _bdd.BDD(memory_estimate=2**25)
+    bdd.configure(reordering=True)
+    bdd.declare(*discovered)
+    root = build_node_functions(sg, g, post_order, bdd)["indicator"]
+    bdd.reorder()
+    return compile_bdd(bdd, root)
+
+
+def minimal_cutsets(sg, ignore_suppliers=False) -> MinimalCutsets:
+    """ Minimal cutsets of the system graph derived from its BDD. The indicator's own cutset is dropped. """
+    cbdd = system_function(sg, ignore_suppliers)
+
+    zdd = _zdd.ZDD()
+    zdd.configure(reordering=False)
+    zdd.declare(*cbdd.var_names)
+    root = minsol(cbdd, zdd)
+    if "indicator" in cbdd.var_names:
+        root = without(zdd, root, zdd.find_or_add("indicator", zdd.false, zdd.true_node))
+    return MinimalCutsets(zdd, root)
@@ -0,0 +1,35 @@
+from typing import Dict
+
+from iscram.domain.model import SystemGraph, DataValidationError
+from iscram.domain.metrics.risk import risk_gradient_by_bdd
+
+
+def posterior_probabilities(sg: SystemGraph, p, evidence=None, system_failed=True, bdd_with_root=None) -> Dict:
+    """ Probability that each node failed given the state of the system and observed node states.
+        - evidence dict: node -> bool, True for a node observed failed and False for one observed working
+        - system_failed bool: condition on the indicator being compromised, or on it being intact
+    Nodes are independent a priori, so evidence only fixes their probabilities. The system risk is multilinear,
+    so R(p_i=1) = R + (1 - p_i) B_i for every node at once from one gradient sweep, and
+    P(x_i | F) = p_i R(p_i=1) / R, P(x_i | not F) = p_i (1 - R(p_i=1)) / (1 - R). """
+    p = dict(p)
+    for node, failed in (evidence or {}).items():
+        if node not in sg.nodes:
+            raise DataValidationError("Node name not in System Graph: {}".format(node))
+        if node == "indicator":
+            raise DataValidationError("Evidence on the indicator is given by system_failed.")
+        p[node] = 1.0 if failed else 0.0
+
+    risk, by_var = risk_gradient_by_bdd(sg, p, bdd_with_root)
+    evidence_probability = risk if system_failed else 1 - risk
+    if evidence_probability <= 0:
+        raise DataValidationError("Evidence is impossible given the system state.")
+
+    posteriors = {}
+    for i in sg.nodes:
+        if i == "indicator":
+            continue
+        risk_failed = risk + (1 - p[i]) * by_var.get(i, 0.0)
+        joint = risk_failed if system_failed else 1 - risk_failed
+        posteriors[i] = min(1.0, max(0.0, p[i] * joint / evidence_probability))
+
+    return {"system_risk": risk, "posteriors": posteriors}
@@ -1,10 +1,13 @@
 from collections import Counter
-from typing import Dict
+from typing import Dict, List
+
+import numpy as np
 
 from iscram.domain.model import (
     SystemGraph, DataValidationError
 )
-from iscram.domain.metrics.risk import risk_by_bdd
+from iscram.domain.metrics.risk import risk_by_bdd, risk_gradient_by_bdd, resolve_compiled_bdd
+from iscram.domain.metrics.compiled_bdd import compiled_bdd_prob_batch, compiled_bdd_gradient_batch
 from iscram.domain.metrics.probability_providers import provide_p_unknown_data
 
 
@@ -27,19 +30,115 @@ def birnbaum_importance(sg: SystemGraph, p, bdd_with_root=None, select=None):
         b_imps["select"] = risk_top-risk_bottom
         return b_imps
 
+    # The Birnbaum importance is the partial derivative of risk with respect to p[i], so a single
+    # forward/backward sweep gives every node at once. Nodes outside the BDD support have importance 0.
+    _, by_var = risk_gradient_by_bdd(sg, p, bdd_with_root)
     for i in sg.nodes:
-        saved = p[i]
-        p[i] = 1.0
-        risk_top = risk_by_bdd(sg, p, bdd_with_root)
-        p[i] = 0.0
-        risk_bottom = risk_by_bdd(sg, p, bdd_with_root)
-        b_imps[i] = risk_top - risk_bottom
-        p[i] = saved  # restore to initial state
+        b_imps[i] = by_var.get(i, 0.0)
 
     del b_imps["indicator"]
     return b_imps
 
 
+def group_birnbaum_importance(sg: SystemGraph, p, groups: List[List[str]], bdd_with_root=None) -> List[float]:
+    """ Birnbaum importance of each group of nodes, R(group failed) - R(group working), as with select in
+    birnbaum_importance. The two conditionings of every group are rows of one matrix evaluated in a single
+    batched BDD sweep. """
+    cbdd = resolve_compiled_bdd(sg, bdd_with_root)
+    column = {v: j for j, v in enumerate(cbdd.var_names)}
+    P = np.tile(np.asarray(cbdd.prob_vector(p), dtype=np.float64), (2 * len(groups), 1))
+    for k, group in enumerate(groups):
+        columns = [column[u] for u in group if u in column]
+        P[2 * k, columns] = 1.0
+        P[2 * k + 1, columns] = 0.0
+    risks = compiled_bdd_prob_batch(cbdd, P)
+    return (risks[0::2] - risks[1::2]).tolist()
+
+
+def joint_importance(sg: SystemGraph, p, nodes=None, threshold=0.0, bdd_with_root=None):
+    """ Joint Birnbaum importance, the second partial derivative of risk for pairs of nodes.
+        - nodes list of str: restricts the pairs to these nodes; defaults to every node but the indicator. Nodes the
+          system function does not depend on have no joint importance and are left out
+        - threshold float: only pairs whose absolute joint importance exceeds it are returned
+    Risk is multilinear, so the Birnbaum importance of j is linear in p_i, and the joint importance is its slope
+    between p and p with p_i moved to 0 or 1, whichever is further away. That is one extra gradient row per
+    node, and all rows are evaluated in one batched sweep. Returns (i, j, value) triples by decreasing absolute
+    value. """
+    cbdd = resolve_compiled_bdd(sg, bdd_with_root)
+    if nodes is None:
+        nodes = [u for u in sg.nodes if u != "indicator"]
+    for u in nodes:
+        if u not in sg.nodes:
+            raise DataValidationError("Node name not in System Graph: {}".format(u))
+    column = {v: j for j, v in enumerate(cbdd.var_names)}
+    nodes = [u for u in nodes if u in column]
+    if len(nodes) < 2:
+        return []
+
+    base = np.asarray(cbdd.prob_vector(p), dtype=np.float64)
+    columns = np.asarray([column[u] for u in nodes])
+    shifted = np.where(base[columns] < 0.5, 1.0, 0.0)
+    P = np.tile(base, (len(nodes) + 1, 1))
+    P[np.arange(1, len(nodes) + 1), columns] = shifted
+
+    _, grads = compiled_bdd_gradient_batch(cbdd, P)
+    grads = grads[:, columns]
+    H = (grads[1:] - grads[0]) / (shifted - base[columns])[:, None]
+    H = (H + H.T) / 2
+
+    rows, cols = np.nonzero(np.triu(np.abs(H) > threshold, k=1))
+    order = np.argsort(-np.abs(H[rows, cols]), kind="stable")
+    return [(nodes[rows[k]], nodes[cols[k]], float(H[rows[k], cols[k]])) for k in order]
+
+
+def attribute_index(data) -> Dict[str, Dict[object, List[str]]]:
+    """ Nodes of data grouped by attribute and attribute value. """
+    index = {}
+    for node, node_data in data.get("nodes", {}).items():
+        for attribute, value in node_data.get("attributes", {}).items():
+            index.setdefault(attribute, {}).setdefault(value, []).append(node)
+    return index
+
+
+IMPORTANCE_MEASURES = ("birnbaum", "improvement_potential", "raw", "rrw", "criticality", "fussell_vesely")
+
+
+def importance_measures(sg: SystemGraph, p, bdd_with_root=None) -> Dict[str, Dict[str, float]]:
+    """ Every importance measure of every node from one risk gradient. Risk is multilinear, so conditioning on a
+    node follows from its Birnbaum importance B: R(p_i=1) = R + (1 - p_i) B and R(p_i=0) = R - p_i B.
+        - improvement_potential: R - R(p_i=0), the risk removed by making the node perfect
+        - raw: R(p_i=1) / R, risk achievement worth
+        - rrw: R / R(p_i=0), risk reduction worth
+        - criticality: p_i B / R, the probability that the node is critical and failed given system failure
+        - fussell_vesely: (R - R(p_i=0)) / R, the fraction of risk involving the node; with exact
+          probabilities rather than the cutset approximation it equals criticality
+    Ratios that are undefined because the denominator is zero are None. """
+    risk, by_var = risk_gradient_by_bdd(sg, p, bdd_with_root)
+
+    def ratio(a, b):
+        return a / b if b > 0 else None
+
+    measures = {}
+    for i in sg.nodes:
+        if i == "indicator":
+            continue
+        b = by_var.get(i, 0.0)
+        top, bottom = risk + (1 - p[i]) * b, risk - p[i] * b
+        measures[i] = {
+            "birnbaum": b,
+            "improvement_potential": risk - bottom,
+            "raw": ratio(top, risk),
+            "rrw": ratio(risk, bottom),
+            "criticality": ratio(p[i] * b, risk),
+            "fussell_vesely": ratio(risk - bottom, risk)
+        }
+    return measures
+
+
+def improvement_potential(sg: SystemGraph, p, bdd_with_root=None) -> Dict[str, float]:
+    return {i: m["improvement_potential"] for i, m in importance_measures(sg, p, bdd_with_root).items()}
+
+
 def fractional_importance_of_attributes(sg: SystemGraph, data, error_on_missing_data=False) -> Dict[str, Dict[bool, float]]:
     all_attributes = []
 
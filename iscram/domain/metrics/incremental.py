@@ -0,0 +1,53 @@
+from typing import Dict
+
+from iscram.domain.metrics.compiled_bdd import CompiledBDD, _forward, _backward, _root_prob
+
+
+class IncrementalEvaluation:
+    def __init__(self, cbdd: CompiledBDD, p):
+        """ Node probabilities of a compiled BDD kept up to date as variable probabilities change.
+            - cbdd CompiledBDD: the system function
+            - p dict: initial probability of every variable
+            A change to a variable only affects the nodes labelled with it and their ancestors, so update
+            re-evaluates that cone, in index order so children are always current, and leaves the rest. """
+        self.cbdd = cbdd
+        self.x = cbdd.prob_vector(p)
+        self.prob = _forward(cbdd, self.x)
+
+        self.parents = [[] for _ in range(len(cbdd))]
+        self.var_nodes = [[] for _ in cbdd.var_names]
+        for k in range(1, len(cbdd)):
+            v, h, lo, _ = cbdd._rows[k]
+            self.var_nodes[v].append(k)
+            self.parents[h].append(k)
+            if lo != h:
+                self.parents[lo].append(k)
+
+    def update(self, p) -> int:
+        """ Sets the probabilities in p; variables missing from p keep their value. Returns the number of
+        re-evaluated nodes. """
+        stack = []
+        for v, name in enumerate(self.cbdd.var_names):
+            if name in p and p[name] != self.x[v]:
+                self.x[v] = p[name]
+                stack.extend(self.var_nodes[v])
+
+        affected = set()
+        while stack:
+            k = stack.pop()
+            if k not in affected:
+                affected.add(k)
+                stack.extend(self.parents[k])
+
+        for k in sorted(affected):
+            v, h, lo, lo_negated = self.cbdd._rows[k]
+            g = 1 - self.prob[lo] if lo_negated else self.prob[lo]
+            self.prob[k] = self.x[v] * self.prob[h] + (1 - self.x[v]) * g
+        return len(affected)
+
+    def risk(self) -> float:
+        return _root_prob(self.cbdd, self.prob)
+
+    def gradient(self) -> Dict[str, float]:
+        """ Partial derivatives from the current node probabilities, so only the backward sweep is run. """
+        return dict(zip(self.cbdd.var_names, _backward(self.cbdd, self.x, self.prob)))
@@ -0,0 +1,193 @@
+from hashlib import md5
+import json
+
+import dd.cudd as _bdd
+
+from iscram.domain.metrics.bdd_functions import prep_for_bdd, build_node_functions
+from iscram.domain.metrics.bdd_manager import get_bdd_manager
+from iscram.domain.metrics.compiled_bdd import compile_bdd, compiled_bdd_prob, compiled_bdd_gradient
+from iscram.domain.metrics.variable_ordering import dependencies
+
+
+MODULE_PREFIX = "@module_"
+
+# Modules smaller than this (in nodes) are left inline in their parent; a separate BDD would not pay off.
+DEFAULT_MIN_MODULE_SIZE = 8
+
+
+def module_variable(u: str) -> str:
+    return MODULE_PREFIX + u
+
+
+def visit_dates(g, root="indicator"):
+    """ Depth first search that advances a date counter on every visit, including repeated visits of shared
+    nodes. Returns the dicts first (date of the first visit), exit (date the first visit finished), last (date of
+    the latest visit) and size (number of nodes discovered while the first visit was active, the node included). """
+    first, exit_, last, size = {}, {}, {}, {}
+    date = 0
+
+    stack = [(root, False)]
+    while stack:
+        u, expanded = stack.pop()
+        date += 1
+        if expanded:
+            exit_[u] = last[u] = date
+            size[u] = len(first) - size[u]
+            continue
+        if u in first:
+            last[u] = date
+            continue
+
+        first[u] = date
+        size[u] = len(first) - 1
+        stack.append((u, True))
+        stack.extend((d, False) for d in reversed(dependencies(g, u)))
+
+    return first, exit_, last, size
+
+
+def find_modules(g, post_order, min_size=1):
+    """ Linear time module detection (Dutuit and Rauzy, 1996). A node with dependencies is a module when its
+    descendants are reached only through it: every visit of a descendant happens while the node's own first
+    visit is active. Returns the modules with at least min_size nodes in post-order, always ending with the root. """
+    root = post_order[-1]
+    first, exit_, last, size = visit_dates(g, root)
+
+    lowest, highest = {}, {}
+    modules = []
+    for u in post_order:
+        deps = dependencies(g, u)
+        lowest[u] = min((min(first[d], lowest[d]) for d in deps), default=first[u] + 1)
+        highest[u] = max((max(last[d], highest[d]) for d in deps), default=first[u])
+        if u == root or (len(deps) > 0 and size[u] >= min_size and
+                         first[u] < lowest[u] and highest[u] < exit_[u]):
+            modules.append(u)
+
+    return modules
+
+
+class ModularDecomposition:
+    def __init__(self, sg, min_size: int = DEFAULT_MIN_MODULE_SIZE):
+        """ Splits a system graph into modules, independent subgraphs that share no nodes with the rest of the graph.
+            - sg SystemGraph: the system graph to decompose
+            - min_size int: smallest module, in nodes, that gets its own BDD
+            Each module has a small BDD of its own, in which nested modules appear as a single pseudo-variable
+            named by module_variable. Module BDDs are compiled once and cached by the structure of the module in
+            the BDD manager, within its memory budget, so modules shared between graphs or unchanged between
+            requests are not built again. """
+        self.sg = sg
+        g, _, post_order = prep_for_bdd(sg)
+
+        self.modules = find_modules(g, post_order, min_size)
+        self.root = self.modules[-1]
+        is_module = set(self.modules)
+        position = {u: i for i, u in enumerate(post_order)}
+
+        # The region of a module holds the nodes evaluated by its own BDD; nested modules are not entered, so the
+        # regions are disjoint and collecting them visits every node once.
+        self.regions, self.children = {}, {}
+        for m in self.modules:
+            region, children = set(), []
+            stack = [m]
+            while stack:
+                u = stack.pop()
+                if u in region:
+                    continue
+                region.add(u)
+                for d in dependencies(g, u):
+                    if d in is_module:
+                        if d not in children:
+                            children.append(d)
+                    elif d not in region:
+                        stack.append(d)
+            self.regions[m] = sorted(region, key=position.get)
+            self.children[m] = children
+
+        self.keys = {}
+        for m in self.modules:
+            self.keys[m] = self._structural_key(g, m)
+
+        self.compiled = self._compile_modules(g)
+
+    def _structural_key(self, g, m):
+        description = [
+            [u, self.sg.nodes[u].logic, g[u].get("component", []), g[u].get("supplier", [])]
+            for u in self.regions[m]
+        ]
+        description.append([[c, self.keys[c]] for c in self.children[m]])
+        return md5(json.dumps(description, sort_keys=True).encode('utf-8')).hexdigest()
+
+    def _compile_modules(self, g):
+        manager = get_bdd_manager()
+        compiled = {}
+        missing = []
+        for m in self.modules:
+            compiled[m] = manager.get_module(self.keys[m])
+            if compiled[m] is None:
+                missing.append(m)
+
+        if missing:
+            # Module variables never overlap, so all missing modules share one manager.
+            bdd = _bdd.BDD(memory_estimate=manager.instance_memory)
+            bdd.configure(reordering=True)
+            for m in missing:
+                bdd.declare(*reversed(self.regions[m]), *(module_variable(c) for c in self.children[m]))
+                memo = {c: bdd.var(module_variable(c)) for c in self.children[m]}
+                root = build_node_functions(self.sg, g, self.regions[m], bdd, memo)[m]
+                compiled[m] = compile_bdd(bdd, root)
+                manager.put_module(self.keys[m], compiled[m])
+
+        return compiled
+
+    def levels(self):
+        """ Groups modules so that every module comes after the modules nested in it; modules in one group are
+        independent of each other and can be evaluated in parallel. """
+        level = {}
+        for m in self.modules:
+            level[m] = 1 + max((level[c] for c in self.children[m]), default=-1)
+        groups = [[] for _ in range(level[self.root] + 1)]
+        for m in self.modules:
+            groups[level[m]].append(m)
+        return groups
+
+    def module_probabilities(self, p, executor=None):
+        """ Probability of every module. With an executor (for example a concurrent.futures.ProcessPoolExecutor)
+        the modules of each level are evaluated concurrently. """
+        p_ext = dict(p)
+        for group in self.levels():
+            inputs = [{v: p_ext[v] for v in self.compiled[m].var_names} for m in group]
+            cbdds = [self.compiled[m] for m in group]
+            if executor is None or len(group) == 1:
+                results = map(compiled_bdd_prob, cbdds, inputs)
+            else:
+                results = executor.map(compiled_bdd_prob, cbdds, inputs)
+            for m, r in zip(group, results):
+                p_ext[module_variable(m)] = r
+        return {m: p_ext[module_variable(m)] for m in self.modules}
+
+    def risk(self, p, executor=None) -> float:
+        return self.module_probabilities(p, executor)[self.root]
+
+    def gradient(self, p):
+        """ Returns the risk and its partial derivative with respect to every node, combining the gradients of the
+        module BDDs with the chain rule. Nodes outside the support of the system function get 0.0. """
+        p_ext = dict(p)
+        for m, r in self.module_probabilities(p).items():
+            p_ext[module_variable(m)] = r
+
+        adjoint = {self.root: 1.0}
+        grad = {u: 0.0 for u in self.sg.nodes}
+        for m in reversed(self.modules):
+            a = adjoint.get(m, 0.0)
+            if a == 0:
+                continue
+            cbdd = self.compiled[m]
+            _, partials = compiled_bdd_gradient(cbdd, p_ext)
+            for v, d in zip(cbdd.var_names, partials):
+                if v.startswith(MODULE_PREFIX):
+                    c = v[len(MODULE_PREFIX):]
+                    adjoint[c] = adjoint.get(c, 0.0) + a * d
+                else:
+                    grad[v] += a * d
+
+        return p_ext[module_variable(self.root)], grad
@@ -0,0 +1,33 @@
+from typing import Dict
+
+import dd.cudd as _bdd
+
+from iscram.domain.metrics.bdd_functions import prep_for_bdd, build_bdd_with_report
+from iscram.domain.metrics.bdd_manager import get_bdd_manager
+from iscram.domain.metrics.compiled_bdd import compile_bdd_roots, _forward
+
+
+class NodeFunctions:
+    def __init__(self, sg):
+        """ The sub-function of every node reachable from the indicator.
+            - sg SystemGraph: the system graph
+            The node BDDs kept by the BDD manager from building the graph's BDD are flattened together, so one
+            bottom-up sweep gives the risk seen at every node. Only when the manager has none, because the BDD
+            came from the disk cache, are they built here, with the manager's configuration. """
+        _, _, post_order = prep_for_bdd(sg)
+
+        manager = get_bdd_manager()
+        built = manager.get_node_functions(sg)
+        if built is None:
+            functions = {}
+            bdd, _, _ = build_bdd_with_report(sg, bdd=_bdd.BDD(memory_estimate=manager.instance_memory),
+                                              functions=functions, **manager.build_options)
+        else:
+            bdd, functions = built
+
+        self.nodes = list(post_order)
+        self.compiled, self.functions = compile_bdd_roots(bdd, [functions[u] for u in self.nodes])
+
+    def node_risks(self, p) -> Dict[str, float]:
+        prob = _forward(self.compiled, self.compiled.prob_vector(p))
+        return {u: 1 - prob[k] if negated else prob[k] for u, (k, negated) in zip(self.nodes, self.functions)}
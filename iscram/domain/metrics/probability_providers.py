@@ -7,6 +7,17 @@ def provide_p_unknown_data(sg: SystemGraph):
     return base
 
 
+def component_suppliers(sg: SystemGraph):
+    """ The supplier of each component, from the edges that are not potential. """
+    node_suppliers = {}
+    for edge in sg.edges:
+        if "potential" in edge.tags:
+            continue
+        if edge.src in sg.suppliers and edge.dst in sg.components:
+            node_suppliers[edge.dst] = edge.src
+    return node_suppliers
+
+
 def provide_p_direct_from_data(sg: SystemGraph, data, error_on_missing_node=False):
     base = {n: 0.0 for n in sg.nodes}
     # First set risk equal to value in node data
@@ -21,13 +32,7 @@ def provide_p_direct_from_data(sg: SystemGraph, data, error_on_missing_node=Fals
             raise DataValidationError("Invalid data provided.")
 
     # If a value exists in edge data then overwrite any previous risk
-    node_suppliers = {}
-    for edge in sg.edges:
-        if "potential" in edge.tags:
-            continue
-        if edge.src in sg.suppliers and edge.dst in sg.components:
-            node_suppliers[edge.dst] = edge.src
-
+    node_suppliers = component_suppliers(sg)
     for edge in data.get("edges", []):
         if edge["src"] == node_suppliers.get(edge["dst"]):
             base[edge["dst"]] = edge.get("risk", base[edge["dst"]])
@@ -1,26 +1,98 @@
 from iscram.domain.model import SystemGraph
 
 from iscram.domain.metrics.cutset import (
-    find_minimal_cutsets, probability_any_cutset
+    find_minimal_cutsets, truncated_mocus, probability_any_cutset
 )
 
-from iscram.domain.metrics.bdd_functions import (
-    bdd_prob, build_bdd
+from iscram.domain.metrics.cutset_probability import CutsetMatrix
+
+from iscram.domain.metrics.simulation import simulate_risk, importance_sample_risk
+
+from iscram.domain.metrics.compiled_bdd import (
+    compile_bdd, compiled_bdd_prob, compiled_bdd_prob_batch, compiled_bdd_gradient
 )
 
 
-def risk_by_bdd(sg: SystemGraph, p, bdd_with_root=None):
+def resolve_compiled_bdd(sg: SystemGraph, bdd_with_root=None):
+    """ Uses the compiled BDD cached on the SystemGraph unless a specific (bdd, root) pair is supplied. """
     if bdd_with_root is None:
-        bdd, root = build_bdd(sg)
-    else:
-        bdd, root = bdd_with_root
+        return sg.get_compiled_bdd()
+    return compile_bdd(*bdd_with_root)
 
-    r = bdd_prob(bdd, root, p, dict())
-    return r
 
+def risk_by_bdd(sg: SystemGraph, p, bdd_with_root=None):
+    # Trees have a closed-form risk; no BDD is built for them unless one is supplied.
+    if bdd_with_root is None and sg.get_tree() is not None:
+        return sg.get_tree().risk(p)
+    cbdd = resolve_compiled_bdd(sg, bdd_with_root)
+    return compiled_bdd_prob(cbdd, p)
 
-def risk_by_cutsets(sg: SystemGraph, p, cutsets=None, ignore_suppliers=True):
-    if cutsets is None:
+
+def risk_gradient_by_bdd(sg: SystemGraph, p, bdd_with_root=None):
+    """ Returns the risk and its partial derivative with respect to each variable of the system function. """
+    if bdd_with_root is None and sg.get_tree() is not None:
+        return sg.get_tree().gradient(p)
+    cbdd = resolve_compiled_bdd(sg, bdd_with_root)
+    risk, grad = compiled_bdd_gradient(cbdd, p)
+    return risk, dict(zip(cbdd.var_names, grad))
+
+
+def risk_by_node(sg: SystemGraph, p):
+    """ Risk seen at every node reachable from the indicator, i.e. the probability of its sub-function. """
+    if sg.get_tree() is not None:
+        return sg.get_tree().node_probabilities(p)
+    return sg.get_node_functions().node_risks(p)
+
+
+def risk_by_bdd_batch(sg: SystemGraph, P, variables, bdd_with_root=None):
+    """ System risk for each row of P, a (scenarios x len(variables)) matrix of node probabilities. """
+    cbdd = resolve_compiled_bdd(sg, bdd_with_root)
+    return compiled_bdd_prob_batch(cbdd, cbdd.prob_matrix(P, variables))
+
+
+def risk_by_modules(sg: SystemGraph, p, executor=None):
+    """ Evaluates each module of the system graph with its own BDD, optionally in parallel. """
+    return sg.get_modules().risk(p, executor)
+
+
+def risk_gradient_by_modules(sg: SystemGraph, p):
+    return sg.get_modules().gradient(p)
+
+
+def risk_by_simplified_bdd(sg: SystemGraph, p):
+    """ Evaluates the BDD of the simplified graph, which has fewer variables than the node-level BDD. """
+    return sg.get_simplified().risk(p)
+
+
+def risk_gradient_by_simplified_bdd(sg: SystemGraph, p):
+    return sg.get_simplified().gradient(p)
+
+
+def risk_by_cutsets(sg: SystemGraph, p, cutsets=None, ignore_suppliers=True, max_order=None, min_probability=None):
+    """ With max_order or min_probability set, only the cutsets within those cutoffs are generated, by
+    truncated MOCUS, which keeps large graphs tractable at the price of underestimating risk. """
+    if cutsets is None and (max_order is not None or min_probability is not None):
+        cutsets = truncated_mocus(sg, ignore_suppliers, p, max_order, min_probability)
+    elif cutsets is None:
         cutsets = find_minimal_cutsets(sg, ignore_suppliers)
 
     return probability_any_cutset(cutsets, p)
+
+
+def risk_bounds_by_cutsets(sg: SystemGraph, p, cutsets=None, ignore_suppliers=False, pairwise=True):
+    """ Lower and upper bounds of the risk, plus the rare-event approximation, from the minimal cutsets. Without
+    pairwise, the lower bound is the largest cutset probability and every bound is linear in the cutsets. """
+    if cutsets is None:
+        cutsets = sg.get_minimal_cutsets() if not ignore_suppliers else find_minimal_cutsets(sg, True)
+    matrix = CutsetMatrix(cutsets)
+    return matrix.bounds(matrix.prob_vector(p), pairwise)
+
+
+def risk_by_simulation(sg: SystemGraph, p, trials=10**6, seed=None, workers=None):
+    """ Monte Carlo estimate of the risk; see simulate_risk for the standard error and confidence interval. """
+    return simulate_risk(sg, p, trials, seed, workers)["risk"]
+
+
+def risk_by_importance_sampling(sg: SystemGraph, p, trials=10**5, seed=None):
+    """ Estimate for small risks, where plain simulation would rarely observe a failure. """
+    return importance_sample_risk(sg, p, trials, seed)["risk"]
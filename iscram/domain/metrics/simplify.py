@@ -0,0 +1,206 @@
+from collections import Counter
+from itertools import count
+
+import dd.cudd as _bdd
+
+from iscram.domain.metrics.bdd_functions import prep_for_bdd, combine_functions
+from iscram.domain.metrics.compiled_bdd import compile_bdd, compiled_bdd_prob, compiled_bdd_gradient
+
+
+GATE_PREFIX = "@gate_"
+EVENT_PREFIX = "@event_"
+
+
+def _gate_graph(sg, g, post_order):
+    """ Expresses the system function as and/or gates over node variables. Node u becomes the gate
+    u | component_logic(dependencies) | supplier_logic(dependencies); only nodes reachable from the indicator
+    are included, so unreachable nodes are pruned here. """
+    gates = {}
+    for u in post_order:
+        inputs = [u]
+        for kind, default in (("component", None), ("supplier", "and")):
+            deps = g[u].get(kind, [])
+            if len(deps) > 0:
+                name = GATE_PREFIX + u + "/" + kind
+                gates[name] = [sg.nodes[u].logic.get(kind, default), [GATE_PREFIX + d for d in deps]]
+                inputs.append(name)
+        gates[GATE_PREFIX + u] = ["or", inputs]
+    return gates
+
+
+def _references(gates, root):
+    counts = Counter(i for _, inputs in gates.values() for i in inputs)
+    counts[root] += 1
+    return counts
+
+
+def _resolve(name, alias):
+    while name in alias:
+        name = alias[name]
+    return name
+
+
+def _collapse_single_inputs(gates, root):
+    """ A gate with one input is replaced by that input everywhere. Returns the possibly replaced root. """
+    alias = {name: inputs[0] for name, (_, inputs) in gates.items() if len(set(inputs)) == 1}
+    if not alias:
+        return root, False
+    for name in alias:
+        del gates[name]
+    for logic_inputs in gates.values():
+        logic_inputs[1] = list(dict.fromkeys(_resolve(i, alias) for i in logic_inputs[1]))
+    return _resolve(root, alias), True
+
+
+def _flatten_same_logic(gates, root):
+    """ Splices a gate into its only parent when both have the same logic, e.g. (a | (b | c)) -> (a | b | c). """
+    refs = _references(gates, root)
+    changed = False
+    for name in list(gates):
+        if name not in gates:
+            continue
+        logic, inputs = gates[name]
+        flat = []
+        for i in inputs:
+            if i in gates and i != root and refs[i] == 1 and gates[i][0] == logic:
+                flat.extend(gates.pop(i)[1])
+                changed = True
+            else:
+                flat.append(i)
+        gates[name][1] = list(dict.fromkeys(flat))
+    return changed
+
+
+def _coalesce_private_variables(gates, root, events, numbering):
+    """ Variables used only by one gate are merged into a single event of that gate's logic. An event of the same
+    logic is merged member by member; an event of the other logic becomes a member itself. """
+    refs = _references(gates, root)
+    changed = False
+    for name, (logic, inputs) in gates.items():
+        private = [i for i in inputs if i not in gates and refs[i] == 1]
+        if len(private) < 2:
+            continue
+        event = EVENT_PREFIX + str(next(numbering))
+        members = []
+        for i in private:
+            members.extend(events.pop(i)[1] if i in events and events[i][0] == logic else [i])
+        events[event] = (logic, members)
+        gates[name][1] = [i for i in inputs if i not in private] + [event]
+        changed = True
+    return changed
+
+
+class SimplifiedGraph:
+    def __init__(self, sg, coalesce: bool = True):
+        """ Normalized form of a system graph for BDD construction.
+            - sg SystemGraph: the system graph to simplify
+            - coalesce bool: merge variables used by a single gate into one event
+            Unreachable nodes are pruned, single-input gates (chains) are folded, nested gates with the same
+            logic are flattened and, optionally, private variables of a gate are merged into one event.
+            The BDD variables are node ids and event ids; events map back to the nodes they merge, so
+            risk and gradients are reported per original node. """
+        self.sg = sg
+        g, discovered, post_order = prep_for_bdd(sg)
+
+        self.gates = _gate_graph(sg, g, post_order)
+        self.root = GATE_PREFIX + post_order[-1]
+        self.events = {}  # event -> (logic, members); members are nodes or events created before it
+        numbering = count()
+
+        changed = True
+        while changed:
+            self.root, changed = _collapse_single_inputs(self.gates, self.root)
+            changed |= _flatten_same_logic(self.gates, self.root)
+            if coalesce:
+                changed |= _coalesce_private_variables(self.gates, self.root, self.events, numbering)
+
+        self.original_variables = len(discovered)
+        self.compiled = self._compile()
+
+    def variables(self):
+        """ BDD variables in depth first order from the root. """
+        order, seen = [], set()
+        stack = [self.root]
+        while stack:
+            u = stack.pop()
+            if u in seen:
+                continue
+            seen.add(u)
+            if u in self.gates:
+                stack.extend(reversed(self.gates[u][1]))
+            else:
+                order.append(u)
+        return order
+
+    def _post_order_gates(self):
+        order, state = [], {}
+        stack = [(self.root, False)]
+        while stack:
+            u, expanded = stack.pop()
+            if expanded:
+                order.append(u)
+            elif u in self.gates and u not in state:
+                state[u] = True
+                stack.append((u, True))
+                stack.extend((i, False) for i in reversed(self.gates[u][1]))
+        return order
+
+    def _compile(self):
+        bdd = _bdd.BDD(memory_estimate=2**25)
+        bdd.configure(reordering=True)
+        bdd.declare(*self.variables())
+
+        memo = {}
+        for name in self._post_order_gates():
+            logic, inputs = self.gates[name]
+            memo[name] = combine_functions(bdd, logic, [memo[i] if i in memo else bdd.var(i) for i in inputs])
+        root = memo[self.root] if self.root in self.gates else bdd.var(self.root)
+        bdd.reorder()
+        return compile_bdd(bdd, root)
+
+    def event_probabilities(self, p):
+        """ Extends p, keyed by node, with the probability of every event. """
+        p_ext = dict(p)
+        for event, (logic, members) in self.events.items():
+            r = 1.0
+            for u in members:
+                r *= p_ext[u] if logic == "and" else 1 - p_ext[u]
+            p_ext[event] = r if logic == "and" else 1 - r
+        return p_ext
+
+    def risk(self, p) -> float:
+        return compiled_bdd_prob(self.compiled, self.event_probabilities(p))
+
+    def gradient(self, p):
+        """ Returns the risk and its partial derivative with respect to every node. An event's partial derivative
+        is passed to its members through d(event)/d(member), the product of the other members' factors. """
+        p_ext = self.event_probabilities(p)
+        risk, partials = compiled_bdd_gradient(self.compiled, p_ext)
+        by_var = dict(zip(self.compiled.var_names, partials))
+
+        # Events only contain earlier events, so the reverse creation order visits an event before its members.
+        for event in reversed(list(self.events)):
+            d = by_var.pop(event, 0.0)
+            logic, members = self.events[event]
+            factors = [p_ext[u] if logic == "and" else 1 - p_ext[u] for u in members]
+            prefix = [1.0]
+            for f in factors[:-1]:
+                prefix.append(prefix[-1] * f)
+            suffix = 1.0
+            for k in range(len(members) - 1, -1, -1):
+                by_var[members[k]] = by_var.get(members[k], 0.0) + d * prefix[k] * suffix
+                suffix *= factors[k]
+
+        grad = {u: 0.0 for u in self.sg.nodes}
+        grad.update(by_var)
+        return risk, grad
+
+    def statistics(self):
+        return {
+            "nodes": len(self.sg.nodes),
+            "reachable_nodes": self.original_variables,
+            "variables": len(self.compiled.var_names),
+            "events": len(self.events),
+            "gates": len(self.gates),
+            "bdd_nodes": len(self.compiled)
+        }
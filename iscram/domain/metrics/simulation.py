@@ -1,136 +1,210 @@
-## Placeholder code, copied from old version
-
-# import numpy as np
-# from multiprocessing import Pool
-#
-# def simulate(choice_problem, system_model, report, threads, trials):
-#     pool = Pool(threads)
-#
-#     params = setup_simulation(choice_problem, system_model, report)
-#     sims = [Simulator(trials // threads, params) for _ in range(threads)]
-#     sim_workers = [pool.apply_async(sims[i].run) for i in range(threads)]
-#     sim_result_list = [worker.get() for worker in sim_workers]
-#
-#     return sim_result_list
-#
-# def setup_simulation(choice_problem, system_model, report):
-#     sim_params = {}
-#     c_risks = np.sum(np.multiply(report["x"], choice_problem.risks), axis=1)
-#     sim_params["N"] = choice_problem.N
-#     sim_params["K"] = choice_problem.K
-#
-#     sim_params["c_p_true"] = np.array([1 - v for v in c_risks])
-#     sim_params["s_idx_by_c"] = [np.nonzero(report["x"][i])[0][0] for i in range(choice_problem.N)]
-#     sim_params["s_p_true"] = choice_problem.s_trusts
-#     sim_params["o_p_true"] = choice_problem.o_trusts
-#     sim_params["s_groups"] = choice_problem.s_groups
-#     sim_params["cutset_masks"] = system_model.cutset_masks
-#
-#     return sim_params
-#
-#
-# class Simulator:
-#     def __init__(self, trials, params):
-#         self.trials = trials
-#         self.params = params
-#         self.s_groups = params["s_groups"]
-#         self.s_idx_by_c = params["s_idx_by_c"]
-#         self.cutset_masks = params["cutset_masks"]
-#
-#     def sim_o_to_s(self, o, s, s_groups):
-#         for k in range(len(s_groups)):
-#             for j in s_groups[k]:
-#                 s[j] = s[j] & o[k]
-#         return s
-#
-#     def sim_s_to_c(self, s, c, s_idx_by_c):
-#         for i in range(len(c)):
-#             s_idx = s_idx_by_c[i]
-#             c[i] = c[i] & s[s_idx]
-#         return c
-#
-#     def sim_c_to_sys(self, c, cutset_masks):
-#         for m in cutset_masks:
-#             if np.sum(np.logical_and(c, m) != c) == 0:
-#                 return False
-#         return True
-#
-#     def filter_chosen_owner_state(self, o, s_groups, s_idx_by_c):
-#         chosen_o_state = []
-#         for k in range(len(s_groups)):
-#             chosen = False
-#             for j in s_groups[k]:
-#                 if j in s_idx_by_c:
-#                     chosen = True
-#             if chosen:
-#                 chosen_o_state.append(o[k])
-#         return chosen_o_state
-#
-#     def count_chosen_owner_state(self, o, s_groups, s_idx_by_c):
-#             chosen_o_state = []
-#             for k in range(len(s_groups)):
-#                 for j in s_groups[k]:
-#                     if j in s_idx_by_c:
-#                         chosen_o_state.append(o[k])
-#             return chosen_o_state
-#
-#     def run(self):
-#         np.random.seed(None)
-#         system_states_any_cause = []
-#         system_states_owner_only = []
-#
-#         # ab = []
-#         # b = []
-#
-#         for trial in range(self.trials):
-#             c_state = np.random.binomial(1, self.params["c_p_true"])
-#             s_state = np.random.binomial(1, self.params["s_p_true"])
-#             o_state = np.random.binomial(1, self.params["o_p_true"])
-#
-#             s_state = self.sim_o_to_s(o_state, s_state, self.params["s_groups"])
-#             c_state = self.sim_s_to_c(s_state, c_state, self.params["s_idx_by_c"])
-#             sys_state = self.sim_c_to_sys(c_state, self.params["cutset_masks"])
-#             system_states_any_cause.append(sys_state)
-#
-#             # repeat test but with perfect s and c states
-#             p_s_state = np.ones(len(s_state), dtype=int)
-#             p_c_state = np.ones(len(c_state), dtype=int)
-#
-#             p_s_state = self.sim_o_to_s(o_state, p_s_state, self.params["s_groups"])
-#             p_c_state = self.sim_s_to_c(p_s_state, p_c_state, self.params["s_idx_by_c"])
-#             p_sys_state = self.sim_c_to_sys(p_c_state, self.params["cutset_masks"])
-#
-#             system_states_owner_only.append(p_sys_state)
-#
-#             # chosen_owner_state = self.filter_chosen_owner_state(o_state, self.params["s_groups"], self.params["s_idx_by_c"])
-#             # ab.append(sys_state and not np.all(chosen_owner_state))
-#             # b.append(not np.all(chosen_owner_state))
-#
-#
-#
-#         avg_system_risk = 1 - (np.average(system_states_any_cause))
-#         avg_o_failures = 1 - np.average(system_states_owner_only)
-#         #print(avg_o_failures)
-#         #total_o_failures = sum(o_failures)
-#
-#
-#         # tmp = 1-(np.average(ab) / np.average(b))
-#
-#         # if avg_o_failures == 0 or avg_system_risk == 0:
-#         #     sys_o_ratio = 0
-#         # else:
-#         #     sys_o_ratio =  avg_o_failures / avg_system_risk
-#
-#         return avg_system_risk, avg_o_failures
-#
-#
-# if __name__ == "__main__":
-#     params = {
-#         "s_groups" : [[3,4], [1, 2], [0], []], "s_idx_by_c": [0,1,2,3,4], "cutset_masks" : [[0,1,1,1,1]],
-#         "c_p_true" : [1,1,1,1,1],
-#         "s_p_true" : [1,1,1,1,1],
-#         "o_p_true" : [1, 1, .5, 1, 1, 1,]
-#     }
-#     sim = Simulator(10, params)
-#     #print(sim.filter_chosen_owner_state([0,1,0,1,1], [[3,4], [1,2], [0]], [0,3,2]))
-#     print(sim.run())
+from concurrent.futures import ProcessPoolExecutor
+from statistics import NormalDist
+import math
+
+import numpy as np
+
+from iscram.domain.metrics.bdd_functions import prep_for_bdd
+
+
+DEFAULT_BLOCK_SIZE = 2**16
+DEFAULT_SHARDS = 16
+MAX_BIAS = 0.5
+
+
+class StructureProgram:
+    def __init__(self, sg):
+        """ The structure function of a system graph as a straight-line program over node indices.
+            - sg SystemGraph: the system graph
+            Nodes reachable from the indicator are numbered in post-order, so evaluating the steps in order
+            always finds the dependencies of a node already computed. States are bit-packed: one uint64 word
+            holds 64 trials, and every step is a bitwise expression over whole rows. """
+        g, _, post_order = prep_for_bdd(sg)
+        self.variables = list(post_order)
+        index = {u: i for i, u in enumerate(post_order)}
+
+        self.steps = []
+        for u in post_order:
+            groups = [
+                (sg.nodes[u].logic.get(kind, default), np.asarray([index[d] for d in g[u][kind]]))
+                for kind, default in (("component", None), ("supplier", "and")) if len(g[u].get(kind, [])) > 0
+            ]
+            self.steps.append(groups)
+
+    def prob_vector(self, p) -> np.ndarray:
+        return np.asarray([p[u] for u in self.variables], dtype=np.float64)
+
+    def evaluate(self, events: np.ndarray) -> np.ndarray:
+        """ System state for bit-packed node events, a (variables x words) uint64 array. """
+        state = np.empty_like(events)
+        for i, groups in enumerate(self.steps):
+            s = events[i].copy()
+            for logic, children in groups:
+                reduce = np.bitwise_and.reduce if logic == "and" else np.bitwise_or.reduce
+                s |= reduce(state[children], axis=0)
+            state[i] = s
+        return state[-1]
+
+
+def unpack_trials(words: np.ndarray, trials: int) -> np.ndarray:
+    return np.unpackbits(words.view(np.uint8), bitorder="little")[:trials].astype(bool)
+
+
+def sample_packed_events(rng, q: np.ndarray, trials: int) -> np.ndarray:
+    """ Independent Bernoulli samples packed into (variables x words) uint64, zero padded; certain events are not
+    drawn. Each variable is drawn and packed straight into its row, so the unpacked trials of only one variable are
+    held at once. """
+    words = -(-trials // 64)
+    packed = np.zeros((len(q), words * 8), dtype=np.uint8)
+    for i, qi in enumerate(q):
+        if qi >= 1:
+            row = np.packbits(np.ones(trials, dtype=bool), bitorder="little")
+        elif qi > 0:
+            row = np.packbits(rng.random(trials) < qi, bitorder="little")
+        else:
+            continue
+        packed[i, :len(row)] = row
+    return packed.view(np.uint64)
+
+
+def count_failures(program: StructureProgram, q: np.ndarray, trials: int, seed, block_size=DEFAULT_BLOCK_SIZE):
+    """ Number of system failures in trials samples drawn with the seed sequence seed. """
+    rng = np.random.default_rng(seed)
+    failures = 0
+    for start in range(0, trials, block_size):
+        n = min(block_size, trials - start)
+        root = program.evaluate(sample_packed_events(rng, q, n))
+        failures += int(np.unpackbits(root.view(np.uint8)).sum())
+    return failures
+
+
+def wilson_interval(successes, trials, confidence=0.95):
+    """ Wilson score interval for a binomial proportion; it stays informative when no failure is observed. """
+    if trials == 0:
+        return 0.0, 1.0
+    z = NormalDist().inv_cdf(0.5 + confidence / 2)
+    phat = successes / trials
+    denominator = 1 + z * z / trials
+    centre = (phat + z * z / (2 * trials)) / denominator
+    spread = z * math.sqrt(phat * (1 - phat) / trials + z * z / (4 * trials * trials)) / denominator
+    return max(0.0, centre - spread), min(1.0, centre + spread)
+
+
+def simulate_risk(sg, p, trials=10**6, seed=None, workers=None, shards=DEFAULT_SHARDS,
+                  block_size=DEFAULT_BLOCK_SIZE, confidence=0.95):
+    """ Monte Carlo estimate of the system risk.
+        - trials int: number of sampled system states
+        - seed int: root of the seed sequence; each shard gets an independent child stream, so a seed
+          reproduces the same estimate whatever the number of workers
+        - workers int: processes to spread the shards over; None or 1 runs in this process
+        Returns a dict with the risk estimate, standard error and confidence interval. """
+    program = StructureProgram(sg)
+    q = program.prob_vector(p)
+
+    shards = max(1, min(shards, trials))
+    sizes = [trials // shards + (1 if i < trials % shards else 0) for i in range(shards)]
+    seeds = np.random.SeedSequence(seed).spawn(shards)
+
+    if workers is None or workers <= 1:
+        counts = [count_failures(program, q, n, s, block_size) for n, s in zip(sizes, seeds)]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            counts = list(executor.map(count_failures, [program] * shards, [q] * shards, sizes, seeds,
+                                       [block_size] * shards))
+
+    failures = sum(counts)
+    risk = failures / trials
+    return {
+        "risk": risk,
+        "failures": failures,
+        "trials": trials,
+        "standard_error": math.sqrt(risk * (1 - risk) / trials),
+        "confidence_interval": wilson_interval(failures, trials, confidence)
+    }
+
+
+def _log_ratios(p: np.ndarray, q: np.ndarray):
+    """ Per-variable log likelihood ratios log(p/q) and log((1-p)/(1-q)); certain events contribute nothing. """
+    with np.errstate(divide="ignore", invalid="ignore"):
+        fail = np.where(q > 0, np.log(p) - np.log(q), 0.0)
+        work = np.where(q < 1, np.log1p(-p) - np.log1p(-q), 0.0)
+    return fail, work
+
+
+def _weighted_failures(program: StructureProgram, p: np.ndarray, q: np.ndarray, trials: int, rng,
+                       block_size=DEFAULT_BLOCK_SIZE, frequencies=False):
+    """ Samples trials states with probabilities q and weighs every failing state by its likelihood ratio with
+    respect to p. Returns the number of failures, the sum and the sum of squares of their weights and, with
+    frequencies, the weighted number of failures in which each variable failed; no failing state is kept. """
+    fail_ratio, work_ratio = _log_ratios(p, q)
+    failures, weight_sum, square_sum = 0, 0.0, 0.0
+    weighted = np.zeros(len(q)) if frequencies else None
+    for start in range(0, trials, block_size):
+        n = min(block_size, trials - start)
+        events = sample_packed_events(rng, q, n)
+        failed = unpack_trials(program.evaluate(events), n)
+        log_weights = np.zeros(int(failed.sum()))
+        for i in range(len(q)):
+            log_weights += np.where(unpack_trials(events[i], n)[failed], fail_ratio[i], work_ratio[i])
+        weights = np.exp(log_weights)
+        if frequencies:
+            for i in range(len(q)):
+                weighted[i] += weights @ unpack_trials(events[i], n)[failed]
+        failures += len(weights)
+        weight_sum += float(weights.sum())
+        square_sum += float((weights ** 2).sum())
+    return failures, weight_sum, square_sum, weighted
+
+
+def _bias_bounds(p: np.ndarray):
+    """ Biased probabilities stay between p and max(p, MAX_BIAS), and impossible events are never biased. Without
+    the cap a node present in most failures would be pushed towards certain failure, and the failures in which it
+    works, still part of the risk, would practically never be sampled again. """
+    return p.copy(), np.where(p > 0, np.maximum(p, MAX_BIAS), 0.0)
+
+
+def importance_sample_risk(sg, p, trials=10**5, seed=None, ce_trials=10**4, ce_iterations=10, rho=0.1,
+                           smoothing=0.7, block_size=DEFAULT_BLOCK_SIZE, confidence=0.95):
+    """ Importance sampling estimate of a small system risk.
+        - trials int: samples of the final estimate
+        - ce_trials int, ce_iterations int: size and number of the cross-entropy rounds that tune the bias
+        - rho float: fraction of failing samples a round needs before the bias is no longer raised
+        - smoothing float: weight of the new probabilities when updating the bias
+        Failure probabilities are first raised uniformly until failures are common, then tuned by the
+        cross-entropy method: each round sets q_i to the weighted frequency of node i among failing samples.
+        Every failing sample of the final round is weighted by its likelihood ratio p(x) / q(x), so the
+        estimate is unbiased. Returns a dict with the risk, its relative error, confidence interval and the
+        biased probabilities used. """
+    program = StructureProgram(sg)
+    p_vec = program.prob_vector(p)
+    low, high = _bias_bounds(p_vec)
+    rng = np.random.default_rng(seed)
+
+    bias = 1.0 / max(1, len(p_vec))
+    q = np.clip(np.maximum(p_vec, bias), low, high)
+    for _ in range(ce_iterations):
+        failures, weight_sum, _, weighted = _weighted_failures(program, p_vec, q, ce_trials, rng, block_size,
+                                                               frequencies=True)
+        if failures < rho * ce_trials and bias < MAX_BIAS:
+            bias = min(MAX_BIAS, 2 * bias)
+            q = np.clip(np.maximum(q, bias), low, high)
+            continue
+        if weight_sum == 0:
+            break
+        target = weighted / weight_sum
+        q = np.clip(smoothing * target + (1 - smoothing) * q, low, high)
+
+    failures, weight_sum, square_sum, _ = _weighted_failures(program, p_vec, q, trials, rng, block_size)
+    risk = weight_sum / trials
+    variance = max(0.0, square_sum / trials - risk ** 2) / max(1, trials - 1)
+    standard_error = math.sqrt(variance)
+    z = NormalDist().inv_cdf(0.5 + confidence / 2)
+    return {
+        "risk": risk,
+        "failures": failures,
+        "trials": trials,
+        "standard_error": standard_error,
+        "relative_error": standard_error / risk if risk > 0 else math.inf,
+        "confidence_interval": (max(0.0, risk - z * standard_error), min(1.0, risk + z * standard_error)),
+        "biased_probabilities": dict(zip(program.variables, q.tolist()))
+    }
@@ -0,0 +1,133 @@
+from collections import OrderedDict
+from typing import Dict, Tuple
+
+import dd.cudd as _bdd
+import numpy as np
+
+from iscram.domain.metrics.bdd_functions import prep_for_bdd, combine_functions
+from iscram.domain.metrics.compiled_bdd import compile_bdd, compiled_bdd_prob, compiled_bdd_prob_batch
+from iscram.domain.metrics.probability_providers import provide_p_direct_from_data
+from iscram.domain.metrics.uncertainty import summarize, DEFAULT_QUANTILES
+
+
+EDGE_PREFIX = "@edge_"
+STRUCTURE_CACHE_SIZE = 64
+
+_structure_cache = OrderedDict()
+
+
+def edge_variable(src: str, dst: str) -> str:
+    return EDGE_PREFIX + src + "->" + dst
+
+
+def uncertain_edges(sg, data) -> Dict[Tuple[str, str], float]:
+    """ Existence probabilities given in data for edges of the graph that are not potential. """
+    present = set((e.src, e.dst) for e in sg.edges if "potential" not in e.tags)
+    return {
+        (edge["src"], edge["dst"]): edge["existence"]
+        for edge in data.get("edges", []) if "existence" in edge and (edge["src"], edge["dst"]) in present
+    }
+
+
+class StructuralUncertainty:
+    def __init__(self, sg, edges):
+        """ System function over node variables and one existence variable per uncertain edge.
+            - sg SystemGraph: the system graph, with every uncertain edge present
+            - edges iterable of (src, dst): the uncertain edges
+            A dependency d of u through an uncertain edge e contributes e & d to an "or" group and ~e | d to an
+            "and" group; an "and" group whose edges are all uncertain also needs one of them to exist. Fixing
+            the edge variables to 0 or 1 gives the function of one realized graph, so every structure is
+            evaluated on this single BDD and nothing is rebuilt per sample. """
+        g, discovered, post_order = prep_for_bdd(sg)
+        self.edges = sorted(edges)
+        self.edge_variables = [edge_variable(*e) for e in self.edges]
+        gated = dict(zip(self.edges, self.edge_variables))
+
+        bdd = _bdd.BDD(memory_estimate=2**25)
+        bdd.configure(reordering=True)
+        bdd.declare(*discovered, *self.edge_variables)
+
+        memo = {}
+        for u in post_order:
+            f = bdd.var(u)
+            for kind, default in (("component", None), ("supplier", "and")):
+                deps = g[u].get(kind, [])
+                if len(deps) == 0:
+                    continue
+                logic = sg.nodes[u].logic.get(kind, default)
+                terms, exists = [], []
+                for d in deps:
+                    if (d, u) not in gated:
+                        terms.append(memo[d])
+                        continue
+                    e = bdd.var(gated[(d, u)])
+                    exists.append(e)
+                    terms.append(e & memo[d] if logic == "or" else ~e | memo[d])
+                group = combine_functions(bdd, logic, terms)
+                if logic == "and" and len(exists) == len(deps):
+                    group &= combine_functions(bdd, "or", exists)
+                f |= group
+            memo[u] = f
+
+        bdd.reorder()
+        self.compiled = compile_bdd(bdd, memo[post_order[-1]])
+
+    def _prob_matrix(self, p, E):
+        """ One row of probabilities per row of edge states E, a (scenarios x edges) matrix. """
+        base = np.asarray([p.get(v, 0.0) for v in self.compiled.var_names], dtype=np.float64)
+        P = np.tile(base, (E.shape[0], 1))
+        column = {v: j for j, v in enumerate(self.compiled.var_names)}
+        for k, v in enumerate(self.edge_variables):
+            if v in column:
+                P[:, column[v]] = E[:, k]
+        return P
+
+    def expected_risk(self, p, existence) -> float:
+        """ Risk averaged over structures, with independent edges existing with the given probabilities. """
+        p_ext = dict(p)
+        p_ext.update((v, existence[e]) for e, v in zip(self.edges, self.edge_variables))
+        return compiled_bdd_prob(self.compiled, p_ext)
+
+    def sample_risks(self, p, existence, samples: int, seed=None):
+        """ Risk of each of samples sampled structures, and the number of distinct structures. Samples that realize
+        the same graph share one evaluation. """
+        rng = np.random.default_rng(seed)
+        q = np.asarray([existence[e] for e in self.edges], dtype=np.float64)
+        E = rng.random((samples, len(self.edges))) < q
+        structures, inverse = np.unique(E, axis=0, return_inverse=True)
+        risks = compiled_bdd_prob_batch(self.compiled, self._prob_matrix(p, structures.astype(np.float64)))
+        return risks[np.reshape(inverse, -1)], len(structures)
+
+
+def structural_uncertainty(sg, edges) -> StructuralUncertainty:
+    """ Cached by graph and set of uncertain edges, so repeated analyses with new risks reuse the BDD. """
+    key = (sg.get_id(), tuple(sorted(edges)))
+    if key in _structure_cache:
+        _structure_cache.move_to_end(key)
+        return _structure_cache[key]
+    _structure_cache[key] = StructuralUncertainty(sg, edges)
+    while len(_structure_cache) > STRUCTURE_CACHE_SIZE:
+        _structure_cache.popitem(last=False)
+    return _structure_cache[key]
+
+
+def release_structural_uncertainty(sg_id: str):
+    """ Drops the cached models of a graph, e.g. when it leaves the repository. """
+    for key in [key for key in _structure_cache if key[0] == sg_id]:
+        del _structure_cache[key]
+
+
+def structural_risk_distribution(sg, data, samples=10000, seed=None, quantiles=DEFAULT_QUANTILES, bins=20) -> Dict:
+    """ Distribution of the system risk over graph structures sampled from the edge existence probabilities in
+    data, with node risks at their point values. """
+    existence = uncertain_edges(sg, data)
+    model = structural_uncertainty(sg, existence)
+    p = provide_p_direct_from_data(sg, data)
+    risks, structures = model.sample_risks(p, existence, samples, seed)
+    return {
+        "samples": samples,
+        "structures": structures,
+        "uncertain_edges": len(existence),
+        "expected_risk": model.expected_risk(p, existence),
+        "risk": summarize(risks, quantiles, bins)
+    }
@@ -0,0 +1,97 @@
+from iscram.domain.metrics.bdd_functions import prep_for_bdd
+from iscram.domain.metrics.variable_ordering import dependencies
+
+
+def is_tree(g, post_order) -> bool:
+    """ True when every reachable node is a dependency of at most one node, at most once. """
+    seen = set()
+    for u in post_order:
+        for d in dependencies(g, u):
+            if d in seen:
+                return False
+            seen.add(d)
+    return True
+
+
+def _group(logic, probs):
+    """ Probability of an and/or group of independent events. """
+    r = 1.0
+    for q in probs:
+        r *= q if logic == "and" else 1 - q
+    return r if logic == "and" else 1 - r
+
+
+def _product(values):
+    r = 1.0
+    for v in values:
+        r *= v
+    return r
+
+
+def _group_partials(logic, probs):
+    """ Partial derivative of an and/or group with respect to each member: the product of the other members'
+    factors, from prefix and suffix products so that zero probabilities need no division. """
+    factors = [q if logic == "and" else 1 - q for q in probs]
+    partials = [1.0] * len(factors)
+    prefix = 1.0
+    for k, f in enumerate(factors):
+        partials[k] = prefix
+        prefix *= f
+    suffix = 1.0
+    for k in range(len(factors) - 1, -1, -1):
+        partials[k] *= suffix
+        suffix *= factors[k]
+    return partials
+
+
+class TreeStructure:
+    def __init__(self, sg, g, post_order):
+        """ Closed-form risk engine for system graphs whose reachable part is a tree.
+            - sg SystemGraph: the system graph
+            - g dict, post_order list: as returned by prep_for_bdd
+            Sub-trees are independent, so the probability of each node follows from its children's in one
+            bottom-up pass, and every Birnbaum importance from one top-down pass; no BDD is built. """
+        self.post_order = post_order
+        self.groups = {}
+        for u in post_order:
+            self.groups[u] = [
+                (sg.nodes[u].logic.get(kind, default), g[u][kind])
+                for kind, default in (("component", None), ("supplier", "and")) if len(g[u].get(kind, [])) > 0
+            ]
+
+    def node_probabilities(self, p):
+        prob = {}
+        for u in self.post_order:
+            r = 1 - p[u]
+            for logic, deps in self.groups[u]:
+                r *= 1 - _group(logic, [prob[d] for d in deps])
+            prob[u] = 1 - r
+        return prob
+
+    def risk(self, p) -> float:
+        return self.node_probabilities(p)[self.post_order[-1]]
+
+    def gradient(self, p):
+        """ Returns the risk and its partial derivative with respect to every reachable node. """
+        prob = self.node_probabilities(p)
+        adjoint = {self.post_order[-1]: 1.0}
+        grad = {}
+
+        # P(u) = 1 - (1 - p_u) * prod over groups of (1 - P(group))
+        for u in reversed(self.post_order):
+            a = adjoint[u]
+            group_probs = [_group(logic, [prob[d] for d in deps]) for logic, deps in self.groups[u]]
+            others = _group_partials("and", [1 - q for q in group_probs])
+            grad[u] = a * _product(1 - q for q in group_probs)
+            for (logic, deps), other in zip(self.groups[u], others):
+                scale = a * (1 - p[u]) * other
+                for d, partial in zip(deps, _group_partials(logic, [prob[x] for x in deps])):
+                    adjoint[d] = scale * partial
+
+        return prob[self.post_order[-1]], grad
+
+
+def tree_structure(sg):
+    """ Returns a TreeStructure when the reachable part of sg is a tree, otherwise None. """
+    g, _, post_order = prep_for_bdd(sg)
+    return TreeStructure(sg, g, post_order) if is_tree(g, post_order) else None
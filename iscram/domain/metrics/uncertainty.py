@@ -0,0 +1,87 @@
+from typing import Dict
+
+import numpy as np
+
+from iscram.domain.metrics.compiled_bdd import compiled_bdd_prob_batch, compiled_bdd_gradient_batch
+from iscram.domain.metrics.probability_providers import provide_p_direct_from_data, component_suppliers
+
+
+DEFAULT_QUANTILES = (0.05, 0.25, 0.5, 0.75, 0.95)
+
+
+def sample_distribution(rng, distribution: Dict, n: int) -> np.ndarray:
+    """ n draws from a risk distribution, as validated by validate_distribution. """
+    kind = distribution["type"]
+    if kind == "beta":
+        return rng.beta(distribution["alpha"], distribution["beta"], n)
+    if kind == "uniform":
+        return rng.uniform(distribution["low"], distribution["high"], n)
+    if kind == "empirical":
+        return rng.choice(np.asarray(distribution["samples"], dtype=np.float64), n)
+    raise ValueError("Unknown distribution type: {}".format(kind))
+
+
+def sample_probabilities(sg, data, variables, n: int, seed=None) -> np.ndarray:
+    """ A (n x len(variables)) matrix of node probabilities. Nodes without a distribution keep the point value
+    given by provide_p_direct_from_data; as there, data on the edge from a component's supplier overrides the
+    component's own data. """
+    rng = np.random.default_rng(seed)
+    p = provide_p_direct_from_data(sg, data)
+    P = np.tile(np.asarray([p[v] for v in variables], dtype=np.float64), (n, 1))
+    column = {v: j for j, v in enumerate(variables)}
+
+    distributions = {}
+    for node, node_data in data.get("nodes", {}).items():
+        if "distribution" in node_data:
+            distributions[node] = node_data["distribution"]
+
+    node_suppliers = component_suppliers(sg)
+    for edge in data.get("edges", []):
+        if edge["src"] == node_suppliers.get(edge["dst"]):
+            if "distribution" in edge:
+                distributions[edge["dst"]] = edge["distribution"]
+            elif "risk" in edge:
+                distributions.pop(edge["dst"], None)
+
+    for node in sorted(distributions):
+        if node in column:
+            P[:, column[node]] = sample_distribution(rng, distributions[node], n)
+    return P
+
+
+def summarize(values: np.ndarray, quantiles=DEFAULT_QUANTILES, bins=None) -> Dict:
+    """ Mean, standard deviation and quantiles of a sample, plus a histogram when bins is given. """
+    summary = {
+        "mean": float(np.mean(values)),
+        "std": float(np.std(values)),
+        "quantiles": {str(q): float(v) for q, v in zip(quantiles, np.quantile(values, quantiles))}
+    }
+    if bins is not None:
+        counts, edges = np.histogram(values, bins=bins)
+        summary["histogram"] = {"counts": counts.tolist(), "edges": edges.tolist()}
+    return summary
+
+
+def risk_distribution(sg, data, samples=10000, seed=None, quantiles=DEFAULT_QUANTILES, bins=20,
+                      importances=True) -> Dict:
+    """ Propagates parametric uncertainty of node risks to the system risk.
+        - samples int: number of probability vectors drawn from the distributions in data
+        - importances bool: also summarize the Birnbaum importance of every node
+        All vectors are evaluated in one batched sweep over the cached compiled BDD; with importances the sweep
+        also runs backwards and yields every node's importance in each scenario. """
+    cbdd = sg.get_compiled_bdd()
+    P = sample_probabilities(sg, data, cbdd.var_names, samples, seed)
+
+    result = {"samples": samples}
+    if importances:
+        risks, grads = compiled_bdd_gradient_batch(cbdd, P)
+        column = {v: j for j, v in enumerate(cbdd.var_names)}
+        zeros = np.zeros(samples)
+        result["importance"] = {
+            u: summarize(grads[:, column[u]] if u in column else zeros, quantiles)
+            for u in sg.nodes if u != "indicator"
+        }
+    else:
+        risks = compiled_bdd_prob_batch(cbdd, P)
+    result["risk"] = summarize(risks, quantiles, bins)
+    return result
@@ -0,0 +1,92 @@
+from collections import deque
+from typing import Dict, List
+
+
+def dependencies(g, u) -> List[str]:
+    return g[u].get("component", []) + g[u].get("supplier", [])
+
+
+def dfs_order(g, discovered, post_order) -> List[str]:
+    """ Nodes in the order a depth first search from the indicator discovers them. """
+    return list(discovered)
+
+
+def bfs_order(g, discovered, post_order) -> List[str]:
+    """ Nodes by breadth first search from the indicator: levels of the graph stay together. """
+    root = post_order[-1]
+    order, seen = [], {root}
+    queue = deque([root])
+    while queue:
+        u = queue.popleft()
+        order.append(u)
+        for d in dependencies(g, u):
+            if d not in seen:
+                seen.add(d)
+                queue.append(d)
+    return order
+
+
+def depth_weighted_order(g, discovered, post_order) -> List[str]:
+    """ Weight heuristic: the indicator has weight 1 and every node splits its weight evenly among itself and its
+    dependencies, so weight halves (or less) with each level. Heavier nodes, which influence more of the
+    function, are placed first; ties keep DFS discovery order. """
+    weight = {u: 0.0 for u in post_order}
+    weight[post_order[-1]] = 1.0
+    for u in reversed(post_order):
+        deps = dependencies(g, u)
+        share = weight[u] / (len(deps) + 1)
+        for d in deps:
+            weight[d] += share
+
+    position = {u: i for i, u in enumerate(discovered)}
+    return sorted(discovered, key=lambda u: (-weight[u], position[u]))
+
+
+def force_order(g, discovered, post_order, max_iterations=None) -> List[str]:
+    """ FORCE heuristic (Aloul, Markov, Sakallah). Each node and its dependencies form a hyperedge. Every
+    iteration moves each node to the average centre of gravity of its hyperedges, which pulls related
+    variables together. Starts from DFS order and keeps the order with the smallest total span. """
+    hyperedges = [[u] + dependencies(g, u) for u in post_order if len(dependencies(g, u)) > 0]
+    if not hyperedges:
+        return list(discovered)
+
+    membership: Dict[str, List[int]] = {u: [] for u in discovered}
+    for i, edge in enumerate(hyperedges):
+        for u in edge:
+            membership[u].append(i)
+
+    def span(pos):
+        return sum(max(pos[u] for u in edge) - min(pos[u] for u in edge) for edge in hyperedges)
+
+    order = list(discovered)
+    position = {u: i for i, u in enumerate(order)}
+    best_order, best_span = order, span(position)
+
+    if max_iterations is None:
+        max_iterations = max(10, 2 * len(order).bit_length())
+    for _ in range(max_iterations):
+        cog = [sum(position[u] for u in edge) / len(edge) for edge in hyperedges]
+        target = {u: (sum(cog[i] for i in membership[u]) / len(membership[u]) if membership[u] else position[u])
+                  for u in order}
+        order = sorted(order, key=lambda u: (target[u], position[u]))
+        position = {u: i for i, u in enumerate(order)}
+        current = span(position)
+        if current >= best_span:
+            break
+        best_order, best_span = order, current
+
+    return best_order
+
+
+ORDERING_HEURISTICS = {
+    "dfs": dfs_order,
+    "bfs": bfs_order,
+    "depth_weighted": depth_weighted_order,
+    "force": force_order
+}
+
+
+def variable_order(g, discovered, post_order, heuristic="dfs") -> List[str]:
+    if heuristic not in ORDERING_HEURISTICS:
+        raise ValueError("Unknown variable ordering heuristic: {}".format(heuristic))
+    return ORDERING_HEURISTICS[heuristic](g, discovered, post_order)
@@ -9,7 +9,13 @@ from pydantic import validator, root_validator
 from pydantic.json import pydantic_encoder
 from pydantic.dataclasses import dataclass
 
-from iscram.domain.metrics.bdd_functions import build_bdd
+from iscram.domain.metrics.bdd_manager import get_bdd_manager
+from iscram.domain.metrics.modules import ModularDecomposition
+from iscram.domain.metrics.simplify import SimplifiedGraph
+from iscram.domain.metrics.tree import tree_structure
+from iscram.domain.metrics.cutset_zdd import minimal_cutsets
+from iscram.domain.metrics.node_risk import NodeFunctions
+from iscram.domain.metrics.incremental import IncrementalEvaluation
 
 
 def validate_identifier(identifier: str) -> bool:
@@ -30,6 +36,23 @@ def validate_cost(cost: int) -> bool:
     return cost >= 0
 
 
+def validate_distribution(distribution: Dict) -> bool:
+    """ A risk distribution is {"type": "beta", "alpha", "beta"}, {"type": "uniform", "low", "high"} or
+    {"type": "empirical", "samples"}, with every value a valid risk. """
+    try:
+        kind = distribution["type"]
+        if kind == "beta":
+            return distribution["alpha"] > 0 and distribution["beta"] > 0
+        if kind == "uniform":
+            return validate_risk(distribution["low"]) and validate_risk(distribution["high"]) and \
+                distribution["low"] <= distribution["high"]
+        if kind == "empirical":
+            return len(distribution["samples"]) > 0 and all(validate_risk(x) for x in distribution["samples"])
+    except (KeyError, TypeError):
+        return False
+    return False
+
+
 class ModelValidationError(Exception):
     def __init__(self, message):
         self.message = message
@@ -166,12 +189,60 @@ class SystemGraph:
     def get_id(self):
         return self._id
 
+    def get_bdd_with_root(self):
+        """ The BDD lives in the shared manager, which may release it under memory pressure and rebuild on demand. """
+        return get_bdd_manager().get_bdd_with_root(self)
+
     @cached_property
-    def _bdd_with_root(self):
-        return build_bdd(self)
+    def _compiled_bdd(self):
+        return get_bdd_manager().get_compiled_bdd(self)
 
-    def get_bdd_with_root(self):
-        return self._bdd_with_root
+    def get_compiled_bdd(self):
+        return self._compiled_bdd
+
+    @cached_property
+    def _modules(self):
+        return ModularDecomposition(self)
+
+    def get_modules(self):
+        return self._modules
+
+    @cached_property
+    def _simplified(self):
+        return SimplifiedGraph(self)
+
+    def get_simplified(self):
+        return self._simplified
+
+    @cached_property
+    def _tree(self):
+        return tree_structure(self)
+
+    def get_tree(self):
+        """ The closed-form TreeStructure when the graph is a tree, otherwise None. """
+        return self._tree
+
+    @cached_property
+    def _node_functions(self):
+        return NodeFunctions(self)
+
+    def get_node_functions(self):
+        return self._node_functions
+
+    def get_incremental_evaluation(self, p):
+        """ Node probabilities of the compiled BDD from the last update, reused when data changes slightly. The
+        first call evaluates the BDD at p. """
+        if "_incremental_evaluation" not in self.__dict__:
+            # Stored the way cached_property stores its values, which the frozen dataclass allows.
+            self.__dict__["_incremental_evaluation"] = IncrementalEvaluation(self.get_compiled_bdd(), p)
+        return self.__dict__["_incremental_evaluation"]
+
+    @cached_property
+    def _minimal_cutsets(self):
+        return minimal_cutsets(self)
+
+    def get_minimal_cutsets(self):
+        return self._minimal_cutsets
 
     @cached_property
     def supplier_groups(self) -> Dict[str, Set[str]]:
@@ -252,7 +323,10 @@ class SystemGraph:
             new_node = Node(logic=n.logic, tags=tags)
             new_nodes[n_id] = new_node
 
-        return SystemGraph(nodes=new_nodes, edges=edges)
+        result = SystemGraph(nodes=new_nodes, edges=edges)
+        # Only supplier edges differ, so the new BDD can start from this graph's node BDDs.
+        get_bdd_manager().derive_from(self, result)
+        return result
 
 
 def validate_data(sg: SystemGraph, data: Dict) -> None:
@@ -265,6 +339,8 @@ def validate_data(sg: SystemGraph, data: Dict) -> None:
                 raise DataValidationError("Node name not in System Graph: {}".format(key))
             if "risk" in value and not validate_risk(value["risk"]):
                 raise DataValidationError("Risk data is invalid for node: {} {}".format(key, value))
+            if "distribution" in value and not validate_distribution(value["distribution"]):
+                raise DataValidationError("Risk distribution is invalid for node: {} {}".format(key, value))
 
     # If edges are described in data dict, edge data must be valid for this System Graph
     if "edges" in data:
@@ -275,7 +351,33 @@ def validate_data(sg: SystemGraph, data: Dict) -> None:
                 raise DataValidationError("Could not find src or dst of edge: {}".format(edge))
             if "risk" in edge and not validate_risk(edge["risk"]):
                 raise DataValidationError("Risk is not valid for edge: {}".format(edge))
+            if "existence" in edge and not validate_risk(edge["existence"]):
+                raise DataValidationError("Existence probability is not valid for edge: {}".format(edge))
+            if "distribution" in edge and not validate_distribution(edge["distribution"]):
+                raise DataValidationError("Risk distribution is not valid for edge: {}".format(edge))
             if "cost" in edge and not validate_cost(edge["cost"]):
                 raise DataValidationError("Cost is not valid for edge: {}".format(edge))
 
 
+def merge_data(data: Dict, delta: Dict) -> Dict:
+    """ Applies a partial data dictionary. Node entries are merged field by field and a null entry removes the node's
+    data. An edge entry replaces the whole edge data with the same src and dst, or removes it when the entry has
+    "remove": true. """
+    merged = {key: value for key, value in data.items() if key not in ("nodes", "edges")}
+    merged["nodes"] = {node: dict(value) for node, value in data.get("nodes", {}).items()}
+    for node, value in delta.get("nodes", {}).items():
+        if value is None:
+            merged["nodes"].pop(node, None)
+        else:
+            merged["nodes"].setdefault(node, {}).update(value)
+
+    edges = {(edge["src"], edge["dst"]): dict(edge) for edge in data.get("edges", [])}
+    for edge in delta.get("edges", []):
+        if "src" not in edge or "dst" not in edge:
+            raise DataValidationError("Edge data missing src or dst field: {}".format(edge))
+        if edge.get("remove", False):
+            edges.pop((edge["src"], edge["dst"]), None)
+        else:
+            edges[(edge["src"], edge["dst"])] = dict(edge)
+    merged["edges"] = list(edges.values())
+    return merged
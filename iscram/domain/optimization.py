@@ -92,7 +92,7 @@ class SupplierChoiceProblem:
             self.supplier_groups[k] = [True if self.map_index_supplier[m] in group else False for m in range(0, self.M)]
 
         # load component importances
-        all_importances = birnbaum_structural_importance(sg, bdd_with_root=sg.get_bdd_with_root())
+        all_importances = birnbaum_structural_importance(sg)
         for i in range(0, self.N):
             self.component_importances[i] = all_importances[self.map_index_component[i]]
 
@@ -1,9 +1,9 @@
-from typing import Dict, Optional
+from typing import Dict, List, Optional
 
 import uvicorn
 from pydantic import BaseModel
 
-from fastapi import FastAPI, Body, Request
+from fastapi import FastAPI, Body, Query, Request
 from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 
@@ -37,6 +37,7 @@ class SystemGraphRequest(BaseModel):
 class RequestBody(BaseModel):
     data: Optional[Dict]
     preferences: Optional[Dict]
+    evidence: Optional[Dict[str, bool]]
 
 
 class AnalysisResponseBody(BaseModel):
@@ -86,33 +87,100 @@ async def get_id(rq: SystemGraphRequest = Body(...)):
     return {"id": rq.system_graph.get_id()}
 
 
+@app.put("/id/{sg_id}/data", response_model=AnalysisResponseBody)
+async def put_data(sg_id: str, rq: RequestBody = Body(...)):
+    sg = services.get_system_graph(sg_id, repo)
+    return dict(name="system_risk", payload=services.put_data(sg, rq.data, repo), data_source="data")
+
+
+@app.patch("/id/{sg_id}/data", response_model=AnalysisResponseBody)
+async def patch_data(sg_id: str, rq: RequestBody = Body(...)):
+    sg = services.get_system_graph(sg_id, repo)
+    return dict(name="system_risk", payload=services.patch_data(sg, rq.data, repo), data_source="data")
+
+
+@app.get("/id/{sg_id}/bdd/report")
+async def bdd_report(sg_id: str):
+    sg = services.get_system_graph(sg_id, repo)
+    return dict(sg_id=sg_id, report=services.get_bdd_report(sg))
+
+
 @app.post("/id/{sg_id}/analyze/system/risk", response_model=AnalysisResponseBody)
 async def system_risk(sg_id: str, data_source: Optional[str] = None, rq: RequestBody = Body(...)):
     # add various risk source options
     sg = services.get_system_graph(sg_id, repo)
-    return dict(name="system_risk", payload=services.get_risk(sg, rq.data), data_source=data_source)
+    return dict(name="system_risk", payload=services.get_risk(sg, rq.data, rq.preferences), data_source=data_source)
 
 
-@app.post("/id/{sg_id}/analyze/node/risk")
-async def node_risk(sg_id: str, data_source: str,  node_id: str, rq: RequestBody = Body(...)):
-    # service for risk at this node (e.g., not at indicator, new bdd, etc).
-    return {"message": "Not implemented."}
+@app.post("/id/{sg_id}/analyze/system/risk/distribution", response_model=AnalysisResponseBody)
+async def system_risk_distribution(sg_id: str, samples: int = Query(10000, ge=1), seed: Optional[int] = None, data_source: Optional[str] = None, rq: RequestBody = Body(...)):
+    sg = services.get_system_graph(sg_id, repo)
+    payload = services.get_risk_distribution(sg, rq.data, samples, seed)
+    return dict(name="system_risk_distribution", payload=payload, data_source=data_source)
+
+
+@app.post("/id/{sg_id}/analyze/system/risk/structural", response_model=AnalysisResponseBody)
+async def system_risk_structural(sg_id: str, samples: int = Query(10000, ge=1), seed: Optional[int] = None, data_source: Optional[str] = None, rq: RequestBody = Body(...)):
+    sg = services.get_system_graph(sg_id, repo)
+    payload = services.get_structural_risk_distribution(sg, rq.data, samples, seed)
+    return dict(name="system_risk_structural", payload=payload, data_source=data_source)
+
+
+@app.post("/id/{sg_id}/analyze/system/cutsets", response_model=AnalysisResponseBody)
+async def system_top_cutsets(sg_id: str, k: int = Query(10, ge=0), data_source: Optional[str] = None, rq: RequestBody = Body(...)):
+    sg = services.get_system_graph(sg_id, repo)
+    return dict(name="system_top_cutsets", payload=services.get_top_cutsets(sg, rq.data, k), data_source=data_source)
+
+
+@app.post("/id/{sg_id}/analyze/node/risk", response_model=AnalysisResponseBody)
+async def node_risk(sg_id: str, data_source: str, rq: RequestBody = Body(...), node_id: Optional[str] = None):
+    sg = services.get_system_graph(sg_id, repo)
+    result = services.get_node_risks(sg, rq.data, data_source, node_id)
+    return dict(name="node_risk", payload=result, node_id=node_id, data_source=data_source)
 
 
 @app.post("/id/{sg_id}/analyze/node/importance/sensitivity", response_model=AnalysisResponseBody)
 async def node_importance_sensitivity(sg_id: str, data_source: str, rq: RequestBody = Body(...), node_id: Optional[str] = None):
     sg = services.get_system_graph(sg_id, repo)
-    result = services.get_birnbaum_importances(sg, rq.data, data_source)
+    result = services.get_birnbaum_importances(sg, rq.data, data_source, rq.preferences)
     if node_id is None:
         return dict(name="node_importance_sensitivity", payload=result, node_id=node_id, data_source=data_source)
     else:
         return dict(name="node_importance_sensitivity", payload={node_id: result[node_id]}, node_id=node_id, data_source=data_source)
 
 
-@app.post("/id/{sg_id}/analyze/node/importance/improvement_potential")
+@app.post("/id/{sg_id}/analyze/node/importance/improvement_potential", response_model=AnalysisResponseBody)
 async def node_importance_improvement_potential(sg_id: str, data_source: str, rq: RequestBody = Body(...), node_id: Optional[str] = None):
-    # service for improvement potential
-    return {"message": "Not implemented."}
+    sg = services.get_system_graph(sg_id, repo)
+    result = services.get_improvement_potentials(sg, rq.data, data_source, rq.preferences)
+    if node_id is None:
+        return dict(name="node_importance_improvement_potential", payload=result, node_id=node_id, data_source=data_source)
+    else:
+        return dict(name="node_importance_improvement_potential", payload={node_id: result[node_id]}, node_id=node_id, data_source=data_source)
+
+
+@app.post("/id/{sg_id}/analyze/node/importance/measures", response_model=AnalysisResponseBody)
+async def node_importance_measures(sg_id: str, data_source: str, rq: RequestBody = Body(...), node_id: Optional[str] = None):
+    sg = services.get_system_graph(sg_id, repo)
+    result = services.get_importance_measures(sg, rq.data, data_source)
+    if node_id is None:
+        return dict(name="node_importance_measures", payload=result, node_id=node_id, data_source=data_source)
+    else:
+        return dict(name="node_importance_measures", payload={node_id: result[node_id]}, node_id=node_id, data_source=data_source)
+
+
+@app.post("/id/{sg_id}/analyze/node/importance/joint", response_model=AnalysisResponseBody)
+async def node_importance_joint(sg_id: str, data_source: str, threshold: float = 0.0, nodes: Optional[List[str]] = Query(None), rq: RequestBody = Body(...)):
+    sg = services.get_system_graph(sg_id, repo)
+    payload = services.get_joint_importances(sg, rq.data, data_source, nodes, threshold)
+    return dict(name="node_importance_joint", payload=payload, data_source=data_source)
+
+
+@app.post("/id/{sg_id}/analyze/node/posterior", response_model=AnalysisResponseBody)
+async def node_posterior(sg_id: str, data_source: str, system_failed: bool = True, rq: RequestBody = Body(...), node_id: Optional[str] = None):
+    sg = services.get_system_graph(sg_id, repo)
+    result = services.get_posteriors(sg, rq.data, data_source, rq.evidence, system_failed, node_id)
+    return dict(name="node_posterior", payload=result, node_id=node_id, data_source=data_source)
 
 
 @app.post("/id/{sg_id}/analyze/attribute/importance/sensitivity", response_model=AnalysisResponseBody)
@@ -1,21 +1,37 @@
 from typing import Dict
 
-from iscram.domain.model import SystemGraph, validate_data
+from iscram.domain.model import SystemGraph, DataValidationError, validate_data, merge_data
 from iscram.domain.optimization import SupplierChoiceProblem
 from iscram.adapters.repository import AbstractRepository
-from iscram.domain.metrics.risk import risk_by_bdd
+from iscram.domain.metrics.risk import (
+    risk_by_bdd, risk_gradient_by_bdd, risk_by_modules, risk_gradient_by_modules, risk_by_simplified_bdd,
+    risk_gradient_by_simplified_bdd, risk_by_node
+)
 from iscram.domain.metrics.importance import (
-    birnbaum_importance, birnbaum_structural_importance, fractional_importance_of_attributes
+    birnbaum_importance, birnbaum_structural_importance, fractional_importance_of_attributes,
+    importance_measures, improvement_potential, attribute_index, group_birnbaum_importance, joint_importance
 )
 from iscram.domain.metrics.probability_providers import (
     provide_p_unknown_data, provide_p_direct_from_data
 )
 from iscram.domain.metrics.scale import apply_scaling
+from iscram.domain.metrics.uncertainty import risk_distribution
+from iscram.domain.metrics.structural import structural_risk_distribution
+from iscram.domain.metrics.diagnosis import posterior_probabilities
+from iscram.domain.metrics.bdd_manager import get_bdd_manager
 
 
 DEFAULT_PREFERENCES = {
     "SCALE_METRICS": "MIN_MAX",
-    "RISK_SOURCE": "KNOWN"
+    "RISK_SOURCE": "KNOWN",
+    "RISK_METHOD": "BDD"
+}
+
+# Risk and gradient functions selected by the RISK_METHOD preference.
+RISK_METHODS = {
+    "BDD": (risk_by_bdd, risk_gradient_by_bdd),
+    "MODULES": (risk_by_modules, risk_gradient_by_modules),
+    "SIMPLIFIED": (risk_by_simplified_bdd, risk_gradient_by_simplified_bdd)
 }
 
 
@@ -28,6 +44,12 @@ def apply_prefs(user_prefs):
     return prefs
 
 
+def risk_method(prefs):
+    if prefs["RISK_METHOD"] not in RISK_METHODS:
+        raise DataValidationError("Unknown risk method: {}".format(prefs["RISK_METHOD"]))
+    return RISK_METHODS[prefs["RISK_METHOD"]]
+
+
 def get_system_graph(sg_id: str, repo: AbstractRepository) -> SystemGraph:
     return repo.get(sg_id)
 
@@ -36,33 +58,153 @@ def put_system_graph(sg: SystemGraph, repo: AbstractRepository):
     repo.put(sg)
 
 
+def put_data(sg: SystemGraph, data: Dict, repo: AbstractRepository) -> Dict:
+    validate_data(sg, data)
+    repo.put_data(sg.get_id(), data)
+    return get_stored_risk(sg, repo)
+
+
+def patch_data(sg: SystemGraph, delta: Dict, repo: AbstractRepository) -> Dict:
+    if delta is None:
+        raise DataValidationError("No data to apply.")
+    data = merge_data(repo.get_data(sg.get_id()), delta)
+    validate_data(sg, data)
+    repo.put_data(sg.get_id(), data)
+    return get_stored_risk(sg, repo)
+
+
+def get_stored_risk(sg: SystemGraph, repo: AbstractRepository) -> Dict:
+    """ Risk and Birnbaum importances for the data stored with the graph. Only the part of the BDD that depends on
+    probabilities changed since the last call is re-evaluated. """
+    p = provide_p_direct_from_data(sg, repo.get_data(sg.get_id()))
+    evaluation = sg.get_incremental_evaluation(p)
+    reevaluated = evaluation.update(p)
+    grad = evaluation.gradient()
+    importance = {u: grad.get(u, 0.0) for u in sg.nodes if u != "indicator"}
+    return {"system": evaluation.risk(), "importance": importance, "reevaluated_nodes": reevaluated}
+
+
+def get_bdd_report(sg: SystemGraph) -> Dict:
+    sg.get_bdd_with_root()
+    return get_bdd_manager().report(sg.get_id())
+
+
 def get_risk(sg: SystemGraph, data: Dict, prefs=None) -> Dict[str, float]:
-    bdd_with_root = sg.get_bdd_with_root()
+    prefs = apply_prefs(prefs)
     validate_data(sg, data)
     p = provide_p_direct_from_data(sg, data)
-    risk = risk_by_bdd(sg, p, bdd_with_root=bdd_with_root)
-    return {"system" : risk}
+    risk, _ = risk_method(prefs)
+    return {"system" : risk(sg, p)}
+
+
+def get_node_risks(sg: SystemGraph, data: Dict, data_src: str, node_id: str = None) -> Dict[str, float]:
+    if node_id is not None and node_id not in sg.nodes:
+        raise DataValidationError("Node name not in System Graph: {}".format(node_id))
+    if data_src == "data":
+        validate_data(sg, data)
+        p = provide_p_direct_from_data(sg, data)
+    else:
+        p = provide_p_unknown_data(sg)
+    result = risk_by_node(sg, p)
+    if node_id is None:
+        return result
+    if node_id not in result:
+        raise DataValidationError("Node not reachable from indicator: {}".format(node_id))
+    return {node_id: result[node_id]}
+
+
+def get_risk_distribution(sg: SystemGraph, data: Dict, samples: int, seed=None) -> Dict:
+    if samples < 1:
+        raise DataValidationError("Number of samples must be positive: {}".format(samples))
+    validate_data(sg, data)
+    return risk_distribution(sg, data, samples, seed)
+
+
+def get_structural_risk_distribution(sg: SystemGraph, data: Dict, samples: int, seed=None) -> Dict:
+    if samples < 1:
+        raise DataValidationError("Number of samples must be positive: {}".format(samples))
+    validate_data(sg, data)
+    return structural_risk_distribution(sg, data, samples, seed)
+
+
+def get_top_cutsets(sg: SystemGraph, data: Dict, k: int) -> Dict:
+    if k < 0:
+        raise DataValidationError("Number of cutsets must not be negative: {}".format(k))
+    validate_data(sg, data)
+    p = provide_p_direct_from_data(sg, data)
+    top = sg.get_minimal_cutsets().top(p, k)
+    return {"cutsets": [{"nodes": sorted(cutset), "probability": probability} for cutset, probability in top]}
 
 
 def get_birnbaum_structural_importances(sg: SystemGraph, data=None, prefs=None) -> Dict[str, float]:
     prefs = apply_prefs(prefs)
-    bdd_with_root = sg.get_bdd_with_root()
-    result = birnbaum_structural_importance(sg, bdd_with_root=bdd_with_root)
+    result = birnbaum_structural_importance(sg)
     return apply_scaling(result, prefs["SCALE_METRICS"])
 
 
 def get_birnbaum_importances(sg: SystemGraph, data: Dict, data_src: str, prefs=None) -> Dict[str, float]:
     prefs = apply_prefs(prefs)
-    bdd_with_root = sg.get_bdd_with_root()
     if data_src == "data":
         p = provide_p_direct_from_data(sg, data)
     else:
         p = provide_p_unknown_data(sg)
 
-    result = birnbaum_importance(sg, p, bdd_with_root=bdd_with_root)
+    _, gradient = risk_method(prefs)
+    if gradient is risk_gradient_by_bdd:
+        result = birnbaum_importance(sg, p)
+    else:
+        _, by_var = gradient(sg, p)
+        result = {i: by_var.get(i, 0.0) for i in sg.nodes if i != "indicator"}
+    return apply_scaling(result, prefs["SCALE_METRICS"])
+
+
+def get_improvement_potentials(sg: SystemGraph, data: Dict, data_src: str, prefs=None) -> Dict[str, float]:
+    prefs = apply_prefs(prefs)
+    if data_src == "data":
+        p = provide_p_direct_from_data(sg, data)
+    else:
+        p = provide_p_unknown_data(sg)
+
+    result = improvement_potential(sg, p)
     return apply_scaling(result, prefs["SCALE_METRICS"])
 
 
+def get_importance_measures(sg: SystemGraph, data: Dict, data_src: str, prefs=None) -> Dict[str, Dict[str, float]]:
+    """ All importance measures per node, unscaled since the ratio measures have their own meaning. """
+    if data_src == "data":
+        p = provide_p_direct_from_data(sg, data)
+    else:
+        p = provide_p_unknown_data(sg)
+
+    return importance_measures(sg, p)
+
+
+def get_joint_importances(sg: SystemGraph, data: Dict, data_src: str, nodes=None, threshold=0.0) -> Dict:
+    if data_src == "data":
+        p = provide_p_direct_from_data(sg, data)
+    else:
+        p = provide_p_unknown_data(sg)
+
+    pairs = joint_importance(sg, p, nodes, threshold)
+    return {"pairs": [{"nodes": [i, j], "joint_importance": value} for i, j, value in pairs]}
+
+
+def get_posteriors(sg: SystemGraph, data: Dict, data_src: str, evidence=None, system_failed=True,
+                   node_id: str = None) -> Dict:
+    if node_id is not None and (node_id not in sg.nodes or node_id == "indicator"):
+        raise DataValidationError("Node has no posterior probability: {}".format(node_id))
+    if data_src == "data":
+        validate_data(sg, data)
+        p = provide_p_direct_from_data(sg, data)
+    else:
+        p = provide_p_unknown_data(sg)
+
+    result = posterior_probabilities(sg, p, evidence, system_failed)
+    if node_id is not None:
+        result["posteriors"] = {node_id: result["posteriors"][node_id]}
+    return result
+
+
 def get_birnbaum_importances_select(sg: SystemGraph, data: Dict, selector: Dict, data_src: str, prefs=None) -> Dict[str, Dict[bool, float]]:
     prefs = apply_prefs(prefs)
 
@@ -71,35 +213,29 @@ def get_birnbaum_importances_select(sg: SystemGraph, data: Dict, selector: Dict,
         return {}
     select_key = select_key[0]
     select_value = selector[select_key]
-    select = []
-
-    for node, node_data in data["nodes"].items():
-        if "attributes" not in node_data:
-            continue
-        attrs = node_data["attributes"]
+    select = attribute_index(data).get(select_key, {}).get(select_value, [])
 
-        if select_key in attrs and attrs[select_key] == select_value:
-            select.append(node)
-
-    bdd_with_root = sg.get_bdd_with_root()
     if data_src == "data":
         p = provide_p_direct_from_data(sg, data)
     else:
         p = provide_p_unknown_data(sg)
-    result = birnbaum_importance(sg, p, bdd_with_root=bdd_with_root, select=select)
+    result = birnbaum_importance(sg, p, select=select)
 
     return {select_key: {select_value: result["select"]}}
 
 
 def get_attribute_sensitivity(sg: SystemGraph, data: Dict, data_src: str, prefs: Dict=None) -> Dict[str, Dict[bool, float]]:
-    all_attrs = set()
-    for node, nodeData in data["nodes"].items():
-        if "attributes" in nodeData:
-            all_attrs.update(nodeData["attributes"])
-    results = {a: {} for a in all_attrs}
-    for attr in all_attrs:
-        for value in (True, False):
-            results[attr].update(get_birnbaum_importances_select(sg, data, {attr: value}, data_src, prefs)[attr])
+    index = attribute_index(data)
+    if data_src == "data":
+        p = provide_p_direct_from_data(sg, data)
+    else:
+        p = provide_p_unknown_data(sg)
+
+    keys = [(attr, value) for attr in index for value in (True, False)]
+    imps = group_birnbaum_importance(sg, p, [index[attr].get(value, []) for attr, value in keys])
+    results = {a: {} for a in index}
+    for (attr, value), imp in zip(keys, imps):
+        results[attr][value] = imp
 
     return results
 
@@ -1,7 +1,8 @@
 import pytest
 
 from iscram.domain.model import SystemGraph
-from iscram.adapters.repository import LRUCacheRepository, RepositoryLookupError
+from iscram.adapters.repository import FakeRepository, LRUCacheRepository, RepositoryLookupError
+from iscram.domain.metrics.structural import structural_uncertainty
 
 
 def test_basic_put_get(minimal: SystemGraph):
@@ -56,4 +57,35 @@ def test_evicted_lru(minimal: SystemGraph, diamond: SystemGraph, full_example_sy
 def test_raise_error_on_absent_graph():
     repo = LRUCacheRepository()
     with pytest.raises(RepositoryLookupError):
-        repo.get("hi")
\ No newline at end of file
+        repo.get("hi")
+
+
+def test_data_dropped_with_graph(minimal: SystemGraph, diamond: SystemGraph):
+    tiny = LRUCacheRepository(1)
+    tiny.put(minimal)
+    tiny.put_data(minimal.get_id(), {"nodes": {}})
+    assert tiny.get_data(minimal.get_id()) == {"nodes": {}}
+
+    tiny.put(diamond)
+    with pytest.raises(RepositoryLookupError):
+        tiny.get_data(minimal.get_id())
+    with pytest.raises(RepositoryLookupError):
+        tiny.get_data(diamond.get_id())
+
+
+def test_fake_repository_raises_on_absent_data(minimal: SystemGraph):
+    repo = FakeRepository()
+    repo.put(minimal)
+    with pytest.raises(RepositoryLookupError):
+        repo.get_data(minimal.get_id())
+
+
+def test_eviction_releases_structural_models(minimal: SystemGraph, diamond: SystemGraph):
+    tiny = LRUCacheRepository(1)
+    tiny.put(minimal)
+    edges = [(e.src, e.dst) for e in minimal.edges][:1]
+    model = structural_uncertainty(minimal, edges)
+    assert structural_uncertainty(minimal, edges) is model
+
+    tiny.put(diamond)
+    assert structural_uncertainty(minimal, edges) is not model
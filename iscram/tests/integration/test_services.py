@@ -1,9 +1,12 @@
 from typing import Dict
+import pytest
 from pytest import approx
 
-from iscram.domain.model import SystemGraph
+from iscram.domain.model import SystemGraph, DataValidationError
 from iscram.adapters.repository import FakeRepository
 from iscram.service_layer import services
+from iscram.domain.metrics.probability_providers import provide_p_direct_from_data
+from iscram.domain.metrics.risk import risk_by_bdd
 from iscram.tests.conftest import get_sg_from_file
 
 
@@ -77,6 +80,10 @@ def test_service_fractional_importance_traits_with_scaling(full_example_system:
 def test_service_get_attribute_sensitivity(full_example_system: SystemGraph, full_example_data_1: Dict):
     result = services.get_attribute_sensitivity(full_example_system, full_example_data_1, "data")
     assert result is not None
+    for attr in ("domestic", "certified"):
+        for value in (True, False):
+            expected = services.get_birnbaum_importances_select(full_example_system, full_example_data_1, {attr: value}, "data")
+            assert result[attr][value] == approx(expected[attr][value])
 
 
 def test_speed_importances_rand_tree_500():
@@ -92,3 +99,95 @@ def test_speed_importances_rand_tree_100():
 def test_speed_importances_rand_tree_50():
     sg = get_sg_from_file("rand_system_graph_tree_50.json")
     assert services.get_birnbaum_structural_importances(sg) is not None
+
+
+def test_service_get_top_cutsets(full_example_system: SystemGraph, full_example_data_1: Dict):
+    result = services.get_top_cutsets(full_example_system, full_example_data_1, 3)
+    probabilities = [c["probability"] for c in result["cutsets"]]
+    assert len(probabilities) == 3
+    assert probabilities == sorted(probabilities, reverse=True)
+    with pytest.raises(DataValidationError):
+        services.get_top_cutsets(full_example_system, full_example_data_1, -1)
+
+
+def test_service_get_risk_distribution(full_example_system: SystemGraph, full_example_data_1: Dict):
+    full_example_data_1["nodes"]["x1"]["distribution"] = {"type": "beta", "alpha": 1, "beta": 9}
+    result = services.get_risk_distribution(full_example_system, full_example_data_1, 1000, seed=0)
+    assert sum(result["risk"]["histogram"]["counts"]) == 1000
+    assert result["importance"]["x1"]["std"] == approx(0, abs=1e-12)
+    with pytest.raises(DataValidationError):
+        services.get_risk_distribution(full_example_system, full_example_data_1, 0)
+
+
+def test_service_structural_risk_distribution_needs_samples(full_example_system: SystemGraph, full_example_data_1: Dict):
+    with pytest.raises(DataValidationError):
+        services.get_structural_risk_distribution(full_example_system, full_example_data_1, 0)
+
+
+def test_service_get_improvement_potentials(full_example_system: SystemGraph, full_example_data_1: Dict):
+    result = services.get_improvement_potentials(full_example_system, full_example_data_1, "data", {"SCALE_METRICS": "NONE"})
+    measures = services.get_importance_measures(full_example_system, full_example_data_1, "data")
+    assert result == {u: m["improvement_potential"] for u, m in measures.items()}
+
+
+def test_service_get_joint_importances(full_example_system: SystemGraph, full_example_data_1: Dict):
+    result = services.get_joint_importances(full_example_system, full_example_data_1, "data", ["x1", "x16", "x25"])
+    assert len(result["pairs"]) == 3
+
+    p = provide_p_direct_from_data(full_example_system, full_example_data_1)
+    i, j = result["pairs"][0]["nodes"]
+
+    def risk(a, b):
+        return risk_by_bdd(full_example_system, {**p, i: a, j: b})
+    assert result["pairs"][0]["joint_importance"] == approx(risk(1, 1) - risk(1, 0) - risk(0, 1) + risk(0, 0))
+
+    with pytest.raises(DataValidationError):
+        services.get_joint_importances(full_example_system, full_example_data_1, "data", ["x1", "typo"])
+
+
+def test_service_get_posteriors(full_example_system: SystemGraph, full_example_data_1: Dict):
+    result = services.get_posteriors(full_example_system, full_example_data_1, "data", {"x1": True})
+    assert result["posteriors"]["x1"] == 1
+    assert result["system_risk"] > 0
+
+
+@pytest.mark.parametrize("method", ["MODULES", "SIMPLIFIED"])
+def test_service_risk_methods(full_example_system: SystemGraph, full_example_data_1: Dict, method):
+    prefs = {"RISK_METHOD": method, "SCALE_METRICS": "NONE"}
+    result = services.get_risk(full_example_system, full_example_data_1, prefs)
+    assert result["system"] == approx(services.get_risk(full_example_system, full_example_data_1)["system"])
+    importances = services.get_birnbaum_importances(full_example_system, full_example_data_1, "data", prefs)
+    assert importances == approx(services.get_birnbaum_importances(full_example_system, full_example_data_1, "data", {"SCALE_METRICS": "NONE"}))
+
+
+def test_service_get_posterior_of_one_node(full_example_system: SystemGraph, full_example_data_1: Dict):
+    result = services.get_posteriors(full_example_system, full_example_data_1, "data", {"x1": True}, node_id="x1")
+    assert result["posteriors"] == {"x1": 1}
+    for node_id in ["no_such_node", "indicator"]:
+        with pytest.raises(DataValidationError):
+            services.get_posteriors(full_example_system, full_example_data_1, "data", node_id=node_id)
+
+
+def test_service_get_node_risks(full_example_system: SystemGraph, full_example_data_1: Dict):
+    result = services.get_node_risks(full_example_system, full_example_data_1, "data")
+    assert result["indicator"] == approx(services.get_risk(full_example_system, full_example_data_1)["system"])
+
+
+def test_service_get_node_risk_unknown_node(full_example_system: SystemGraph, full_example_data_1: Dict):
+    assert list(services.get_node_risks(full_example_system, full_example_data_1, "data", "x1")) == ["x1"]
+    with pytest.raises(DataValidationError):
+        services.get_node_risks(full_example_system, full_example_data_1, "data", "no_such_node")
+
+
+def test_service_patch_data(full_example_system: SystemGraph, full_example_data_1: Dict):
+    repo = FakeRepository()
+    services.put_system_graph(full_example_system, repo)
+    assert services.put_data(full_example_system, full_example_data_1, repo)["reevaluated_nodes"] == 0
+
+    result = services.patch_data(full_example_system, {"nodes": {"x3": {"risk": 0.5}}}, repo)
+    full_example_data_1["nodes"]["x3"]["risk"] = 0.5
+    assert result["system"] == approx(services.get_risk(full_example_system, full_example_data_1)["system"])
+    assert result["importance"] == approx(services.get_birnbaum_importances(full_example_system, full_example_data_1, "data", {"SCALE_METRICS": "NONE"}))
+    assert result["reevaluated_nodes"] < len(full_example_system.get_compiled_bdd())
+    with pytest.raises(DataValidationError):
+        services.patch_data(full_example_system, None, repo)
@@ -0,0 +1,54 @@
+import dd.cudd as _bdd
+import numpy as np
+import pytest
+
+from iscram.domain.model import SystemGraph
+from iscram.domain.metrics import bdd_manager
+from iscram.domain.metrics.bdd_cache import BDDDiskCache
+from iscram.domain.metrics.bdd_manager import BDDManager
+from iscram.domain.metrics.compiled_bdd import compile_bdd, compiled_bdd_prob, load_compiled_bdd
+from iscram.domain.metrics.probability_providers import provide_p_unknown_data
+
+
+def test_disk_cache_round_trip(canonical: SystemGraph, tmp_path):
+    cache = BDDDiskCache(str(tmp_path))
+    cbdd = canonical.get_compiled_bdd()
+    cache.save(canonical.get_id(), cbdd)
+
+    loaded = cache.load(canonical.get_id())
+    assert loaded.var_names == cbdd.var_names
+    assert np.array_equal(loaded.high, cbdd.high) and np.array_equal(loaded.low_negated, cbdd.low_negated)
+    assert (loaded.root, loaded.root_negated) == (cbdd.root, cbdd.root_negated)
+
+
+def test_disk_cache_missing_or_corrupt(tmp_path):
+    cache = BDDDiskCache(str(tmp_path))
+    assert cache.load("absent") is None
+
+    (tmp_path / "broken.v1.npz").write_bytes(b"not a zip file")
+    assert cache.load("broken") is None
+
+
+def test_load_compiled_bdd_keeps_function(canonical: SystemGraph):
+    cbdd = canonical.get_compiled_bdd()
+    bdd = _bdd.BDD()
+    root = load_compiled_bdd(cbdd, bdd)
+
+    p = provide_p_unknown_data(canonical)
+    assert compiled_bdd_prob(compile_bdd(bdd, root), p) == pytest.approx(compiled_bdd_prob(cbdd, p))
+    assert [bdd.var_at_level(i) for i in range(len(cbdd.var_names))] == cbdd.var_names
+
+
+def test_manager_loads_from_disk_without_building(canonical: SystemGraph, tmp_path, monkeypatch):
+    p = provide_p_unknown_data(canonical)
+    expected = compiled_bdd_prob(BDDManager(cache_dir=str(tmp_path)).get_compiled_bdd(canonical), p)
+
+    def fail(*args, **kwargs):
+        raise AssertionError("BDD should have been loaded from the disk cache.")
+
+    monkeypatch.setattr(bdd_manager, "build_bdd_with_report", fail)
+    manager = BDDManager(cache_dir=str(tmp_path))
+    bdd, root = manager.get_bdd_with_root(canonical)
+    assert compiled_bdd_prob(compile_bdd(bdd, root), p) == pytest.approx(expected)
+    assert compiled_bdd_prob(manager.get_compiled_bdd(canonical), p) == pytest.approx(expected)
+    assert manager.report(canonical.get_id())["source"] == "disk"
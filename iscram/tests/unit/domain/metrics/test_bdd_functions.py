@@ -2,12 +2,26 @@ import dd.cudd as _bdd
 
 import pytest
 
-from iscram.domain.model import SystemGraph
+from iscram.domain.model import SystemGraph, Node, Edge
 from iscram.domain.metrics.bdd_functions import (
-    build_bdd, bdd_prob, build_sg_graph_dict, recursive_build_expr
+    build_bdd, bdd_prob, build_sg_graph_dict, recursive_build_expr, dependency_orders
 )
 
 
+def chain_of_diamonds(n):
+    """ Each level depends twice on the level below, so the expanded expression would have 2**n terms. """
+    nodes = {"indicator": Node(logic={"component": "and"}, tags=frozenset(["indicator"]))}
+    edges = [Edge(src="a0", dst="indicator")]
+    for i in range(n):
+        nodes["a" + str(i)] = Node(logic={"component": "and"}, tags=frozenset(["component"]))
+        nodes["b" + str(i)] = Node(logic={"component": "or"}, tags=frozenset(["component"]))
+        nodes["c" + str(i)] = Node(logic={"component": "and"}, tags=frozenset(["component"]))
+        edges += [Edge(src="b" + str(i), dst="a" + str(i)), Edge(src="c" + str(i), dst="a" + str(i))]
+        if i + 1 < n:
+            edges += [Edge(src="a" + str(i + 1), dst="b" + str(i)), Edge(src="a" + str(i + 1), dst="c" + str(i))]
+    return SystemGraph(nodes=nodes, edges=edges)
+
+
 def test_smoke_build_bdd(minimal: SystemGraph):
     bdd, root = build_bdd(minimal)
     assert bdd is not None
@@ -48,6 +62,34 @@ def test_recursive_build_expr_2(diamond_suppliers: SystemGraph):
     assert recursive_build_expr(diamond_suppliers, g, "indicator", []) == expected
 
 
+def test_dependency_orders(diamond_suppliers: SystemGraph):
+    g = build_sg_graph_dict(diamond_suppliers)
+    discovered, post_order = dependency_orders(g)
+    assert discovered == ["indicator", "x3", "x1", "s1", "s3", "x2", "s2"]
+    assert post_order.index("x1") < post_order.index("x2") < post_order.index("indicator")
+    assert post_order[-1] == "indicator"
+
+
+def test_dependency_orders_cycle():
+    g = {"indicator": {"component": ["x1"]}, "x1": {"component": ["x2"]}, "x2": {"component": ["x1"]}}
+    with pytest.raises(ValueError):
+        dependency_orders(g)
+
+
+def test_build_bdd_matches_expression(full_example_system: SystemGraph):
+    bdd, root = build_bdd(full_example_system)
+    g = build_sg_graph_dict(full_example_system)
+    assert root == bdd.add_expr(recursive_build_expr(full_example_system, g, "indicator", []))
+
+
+def test_build_bdd_shared_dependencies():
+    sg = chain_of_diamonds(60)
+    bdd, root = build_bdd(sg)
+    assert len(bdd.support(root)) == 181
+    p = {v: 0.1 for v in bdd.support(root)}
+    assert 0.1 < bdd_prob(bdd, root, p, dict()) < 1
+
+
 def test_prob_ex_rauzy_1():
     vars = ["a", "c", "b"]
     r_expr = "(a | c) & (b | c)"
@@ -0,0 +1,114 @@
+import pytest
+
+from iscram.domain.model import SystemGraph, Edge
+from iscram.domain.metrics.bdd_functions import build_bdd
+from iscram.domain.metrics import bdd_manager
+from iscram.domain.metrics.bdd_manager import BDDManager, BYTES_PER_NODE, BYTES_PER_COMPILED_NODE, get_bdd_manager
+from iscram.domain.metrics.compiled_bdd import compile_bdd, compiled_bdd_prob
+from iscram.adapters.repository import LRUCacheRepository
+
+
+def test_manager_reuses_graph_bdd(minimal: SystemGraph):
+    manager = BDDManager()
+    bdd, root = manager.get_bdd_with_root(minimal)
+    assert manager.get_bdd_with_root(minimal) == (bdd, root)
+    assert manager.node_count(minimal.get_id()) > 0
+
+
+def test_manager_compiles_once(minimal: SystemGraph, monkeypatch):
+    calls = []
+    monkeypatch.setattr(bdd_manager, "compile_bdd", lambda *args: calls.append(args) or compile_bdd(*args))
+    manager = BDDManager()
+    manager.get_bdd_with_root(minimal)
+    assert len(calls) == 0
+    assert manager.get_compiled_bdd(minimal) is manager.get_compiled_bdd(minimal)
+    assert len(calls) == 1
+
+
+def test_manager_release(minimal: SystemGraph):
+    manager = BDDManager()
+    manager.get_bdd_with_root(minimal)
+    manager.release(minimal.get_id())
+    assert minimal.get_id() not in manager
+    assert manager.node_count() == 0
+
+
+def test_manager_evicts_least_recently_used(minimal: SystemGraph, diamond: SystemGraph, canonical: SystemGraph):
+    manager = BDDManager(memory_budget=2 * 2**20 + 2**19, instance_memory=2**20)
+    manager.get_bdd_with_root(minimal)
+    manager.get_bdd_with_root(diamond)
+    manager.get_bdd_with_root(minimal)
+    manager.get_bdd_with_root(canonical)
+
+    assert diamond.get_id() not in manager
+    assert minimal.get_id() in manager and canonical.get_id() in manager
+    assert manager.memory_used() <= manager.memory_budget
+
+
+def test_manager_keeps_most_recent_over_budget(canonical: SystemGraph):
+    manager = BDDManager(memory_budget=1, instance_memory=2**20)
+    manager.get_bdd_with_root(canonical)
+    assert canonical.get_id() in manager
+
+
+def test_manager_counts_and_evicts_modules_first(minimal: SystemGraph, canonical: SystemGraph):
+    manager = BDDManager(memory_budget=2**20 + 2**10, instance_memory=2**20)
+    cbdd = compile_bdd(*build_bdd(canonical))
+    manager.put_module("m", cbdd)
+    assert manager.get_module("m") is cbdd
+    assert manager.memory_used() == len(cbdd) * BYTES_PER_COMPILED_NODE
+
+    manager.get_bdd_with_root(minimal)
+    assert manager.get_module("m") is None
+    assert minimal.get_id() in manager
+
+
+def test_repository_eviction_releases_bdd(minimal: SystemGraph, diamond: SystemGraph):
+    repo = LRUCacheRepository(1)
+    repo.put(minimal)
+    minimal.get_bdd_with_root()
+    assert minimal.get_id() in get_bdd_manager()
+
+    repo.put(diamond)
+    assert minimal.get_id() not in get_bdd_manager()
+
+
+def test_manager_derives_supplier_variant(full_example_system: SystemGraph):
+    manager = BDDManager()
+    manager.get_bdd_with_root(full_example_system)
+
+    variant = full_example_system.with_suppliers([Edge(src="x29", dst="x1")])
+    manager.derive_from(full_example_system, variant)
+    derived = compile_bdd(*manager.get_bdd_with_root(variant))
+    report = manager.report(variant.get_id())
+    assert report["source"] == "derived"
+    assert 0 < report["rebuilt_nodes"] < len(variant.nodes)
+
+    p = {u: 0.1 + 0.01 * k for k, u in enumerate(sorted(variant.nodes))}
+    assert compiled_bdd_prob(derived, p) == pytest.approx(compiled_bdd_prob(compile_bdd(*build_bdd(variant)), p))
+
+
+def test_manager_charges_shared_instance_once(full_example_system: SystemGraph):
+    manager = BDDManager()
+    manager.get_bdd_with_root(full_example_system)
+    variants = [full_example_system.with_suppliers([Edge(src=s, dst="x1")]) for s in ("x29", "x30")]
+    for variant in variants:
+        manager.derive_from(full_example_system, variant)
+        manager.get_bdd_with_root(variant)
+
+    statistics = manager.statistics()
+    assert statistics["graphs"] == 3 and statistics["instances"] == 1
+    assert manager.memory_used() == manager.instance_memory + manager.node_count() * BYTES_PER_NODE
+    assert manager.node_count() == manager.node_count(full_example_system.get_id())
+
+
+def test_manager_builds_variant_of_released_parent(full_example_system: SystemGraph):
+    manager = BDDManager()
+    manager.get_bdd_with_root(full_example_system)
+    variant = full_example_system.with_suppliers([Edge(src="x29", dst="x1")])
+    manager.derive_from(full_example_system, variant)
+    manager.release(full_example_system.get_id())
+    assert len(manager._parents) == 0
+
+    manager.get_bdd_with_root(variant)
+    assert manager.report(variant.get_id())["source"] == "built"
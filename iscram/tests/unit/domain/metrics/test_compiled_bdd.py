@@ -0,0 +1,120 @@
+import dd.cudd as _bdd
+import numpy as np
+
+import pytest
+
+from iscram.domain.model import SystemGraph
+from iscram.domain.metrics.bdd_functions import bdd_prob
+from iscram.domain.metrics.compiled_bdd import (
+    compile_bdd, compiled_bdd_prob, compiled_bdd_prob_batch, compiled_bdd_gradient, compiled_bdd_gradient_batch
+)
+from iscram.domain.metrics.probability_providers import provide_p_unknown_data
+
+
+def test_compile_topological_order(canonical: SystemGraph):
+    cbdd = compile_bdd(*canonical.get_bdd_with_root())
+    for k in range(1, len(cbdd)):
+        assert cbdd.high[k] < k and cbdd.low[k] < k
+
+
+def test_compiled_matches_recursive(canonical: SystemGraph):
+    bdd, root = canonical.get_bdd_with_root()
+    p = provide_p_unknown_data(canonical)
+    assert compiled_bdd_prob(compile_bdd(bdd, root), p) == pytest.approx(bdd_prob(bdd, root, p, dict()))
+
+
+def test_compiled_prob_negated_edges():
+    bdd = _bdd.BDD()
+    bdd.declare('a', 'b', 'c')
+    r = bdd.add_expr("a & ~(b | ~c)")
+
+    x = {"a": 0.5, "b": 0.25, "c": 0.125}
+    assert compiled_bdd_prob(compile_bdd(bdd, r), x) == 0.046875
+    assert compiled_bdd_prob(compile_bdd(bdd, ~r), x) == 1 - 0.046875
+
+
+def test_compiled_prob_constants():
+    bdd = _bdd.BDD()
+    assert compiled_bdd_prob(compile_bdd(bdd, bdd.true), {}) == 1
+    assert compiled_bdd_prob(compile_bdd(bdd, bdd.false), {}) == 0
+
+
+def test_compiled_prob_deep_chain():
+    # Deeper than the default recursion limit
+    names = ["x{}".format(i) for i in range(3000)]
+    bdd = _bdd.BDD()
+    bdd.configure(reordering=False)
+    bdd.declare(*names)
+    r = bdd.false
+    for v in reversed(names):
+        r = bdd.apply("or", bdd.var(v), r)
+
+    p = {v: 0.0 for v in names}
+    p["x2999"] = 0.5
+    assert compiled_bdd_prob(compile_bdd(bdd, r), p) == 0.5
+
+
+def test_compiled_bdd_cached(minimal: SystemGraph):
+    assert minimal.get_compiled_bdd() is minimal.get_compiled_bdd()
+
+
+def test_batch_matches_scalar(canonical: SystemGraph):
+    cbdd = canonical.get_compiled_bdd()
+    P = np.random.default_rng(7).random((50, len(cbdd.var_names)))
+
+    expected = [compiled_bdd_prob(cbdd, dict(zip(cbdd.var_names, row))) for row in P]
+    assert compiled_bdd_prob_batch(cbdd, P) == pytest.approx(expected)
+
+
+def test_batch_chunking(canonical: SystemGraph):
+    cbdd = canonical.get_compiled_bdd()
+    P = np.random.default_rng(11).random((20, len(cbdd.var_names)))
+
+    assert compiled_bdd_prob_batch(cbdd, P, max_cells=1) == pytest.approx(compiled_bdd_prob_batch(cbdd, P))
+
+
+def test_batch_negated_edges():
+    bdd = _bdd.BDD()
+    bdd.declare('a', 'b', 'c')
+    cbdd = compile_bdd(bdd, bdd.add_expr("a & ~(b | ~c)"))
+    P = cbdd.prob_matrix([[0.5, 0.25, 0.125], [1, 0, 1]], ["a", "b", "c"])
+
+    assert list(compiled_bdd_prob_batch(cbdd, P)) == [0.046875, 1.0]
+
+
+def test_batch_wrong_shape(minimal: SystemGraph):
+    with pytest.raises(ValueError):
+        compiled_bdd_prob_batch(minimal.get_compiled_bdd(), np.zeros((2, 1)))
+
+
+def test_gradient_matches_conditioning(canonical: SystemGraph):
+    cbdd = canonical.get_compiled_bdd()
+    p = dict(zip(cbdd.var_names, np.random.default_rng(3).random(len(cbdd.var_names))))
+
+    risk, grad = compiled_bdd_gradient(cbdd, p)
+    assert risk == pytest.approx(compiled_bdd_prob(cbdd, p))
+    for v, g in zip(cbdd.var_names, grad):
+        top = compiled_bdd_prob(cbdd, {**p, v: 1.0})
+        bottom = compiled_bdd_prob(cbdd, {**p, v: 0.0})
+        assert g == pytest.approx(top - bottom)
+
+
+def test_gradient_negated_root():
+    bdd = _bdd.BDD()
+    bdd.declare('a', 'b')
+    cbdd = compile_bdd(bdd, ~bdd.add_expr("a & b"))
+
+    risk, grad = compiled_bdd_gradient(cbdd, {"a": 0.5, "b": 0.25})
+    assert risk == 1 - 0.125
+    assert dict(zip(cbdd.var_names, grad)) == {"a": -0.25, "b": -0.5}
+
+
+def test_gradient_batch_matches_scalar(canonical: SystemGraph):
+    cbdd = canonical.get_compiled_bdd()
+    P = np.random.default_rng(5).random((10, len(cbdd.var_names)))
+
+    risks, grads = compiled_bdd_gradient_batch(cbdd, P, max_cells=len(cbdd) * 3)
+    for row, risk, grad in zip(P, risks, grads):
+        expected_risk, expected_grad = compiled_bdd_gradient(cbdd, dict(zip(cbdd.var_names, row)))
+        assert risk == pytest.approx(expected_risk)
+        assert grad == pytest.approx(expected_grad)
@@ -1,8 +1,11 @@
 import pytest
 
+import math
+
 from iscram.domain.metrics.cutset import (
-    mocus, probability_union, minimize_cutsets, brute_force_bdd_cutsets
+    mocus, truncated_mocus, probability_union, minimize_cutsets, brute_force_bdd_cutsets
 )
+from iscram.domain.metrics.risk import risk_by_cutsets
 
 from iscram.domain.model import SystemGraph
 
@@ -78,3 +81,31 @@ def test_brute_force_bdd_cutsets(canonical: SystemGraph):
 
     assert brute_force_bdd_cutsets(canonical) == expected
 
+
+@pytest.mark.parametrize("name", ["minimal", "diamond_suppliers", "canonical", "full_example_system"])
+@pytest.mark.parametrize("ignore_suppliers", [False, True])
+def test_truncated_mocus_without_cutoffs(request, name, ignore_suppliers):
+    sg = request.getfixturevalue(name)
+    assert truncated_mocus(sg, ignore_suppliers) == mocus(sg, ignore_suppliers)
+
+
+def test_truncated_mocus_max_order(full_example_system: SystemGraph):
+    expected = frozenset(c for c in mocus(full_example_system) if len(c) <= 2)
+    assert truncated_mocus(full_example_system, max_order=2) == expected
+
+
+def test_truncated_mocus_min_probability(full_example_system: SystemGraph):
+    p = {u: 0.1 + 0.02 * i for i, u in enumerate(sorted(full_example_system.nodes))}
+    expected = frozenset(c for c in mocus(full_example_system) if math.prod(p[u] for u in c) >= 0.005)
+    assert truncated_mocus(full_example_system, p=p, min_probability=0.005) == expected
+
+    with pytest.raises(ValueError):
+        truncated_mocus(full_example_system, min_probability=0.005)
+
+
+def test_risk_by_cutsets_truncated(full_example_system: SystemGraph):
+    p = {u: 0.01 for u in full_example_system.nodes}
+    full = risk_by_cutsets(full_example_system, p)
+    truncated = risk_by_cutsets(full_example_system, p, max_order=3)
+    assert truncated <= full
+    assert truncated == pytest.approx(full, rel=1e-3)
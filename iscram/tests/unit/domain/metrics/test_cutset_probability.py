@@ -0,0 +1,64 @@
+import math
+
+import numpy as np
+import pytest
+
+from iscram.domain.model import SystemGraph
+from iscram.domain.metrics.cutset import find_minimal_cutsets
+from iscram.domain.metrics.cutset_probability import CutsetMatrix
+from iscram.domain.metrics.risk import risk_by_bdd
+
+
+def example_p(sg, scale=1.0):
+    p = {u: scale * (0.02 + 0.5 * i / len(sg.nodes)) for i, u in enumerate(sorted(sg.nodes))}
+    p["indicator"] = 0
+    return p
+
+
+def test_cutset_probabilities():
+    matrix = CutsetMatrix([frozenset(["a", "b"]), frozenset(["c"])])
+    assert matrix.variables == ["a", "b", "c"]
+    assert matrix.cutset_probabilities([0.5, 0.4, 0.1])[0].tolist() == pytest.approx([0.2, 0.1])
+    assert matrix.rare_event([0.5, 0.4, 0.1]) == pytest.approx(0.3)
+    assert matrix.min_cut_upper_bound([0.5, 0.4, 0.1]) == pytest.approx(1 - 0.8 * 0.9)
+
+
+def test_pairwise_sum_matches_direct(canonical: SystemGraph):
+    cutsets = list(find_minimal_cutsets(canonical))
+    matrix = CutsetMatrix(cutsets)
+    p = example_p(canonical)
+    p[next(iter(cutsets[0]))] = 0.0
+
+    expected = sum(math.prod(p[u] for u in cutsets[i] | cutsets[j])
+                   for i in range(len(cutsets)) for j in range(i + 1, len(cutsets)))
+    assert matrix.pairwise_sum(matrix.prob_vector(p)) == pytest.approx(expected)
+
+
+def test_pairwise_sum_cell_cap(canonical: SystemGraph):
+    matrix = CutsetMatrix(find_minimal_cutsets(canonical))
+    p = matrix.prob_vector(example_p(canonical))
+    assert matrix.shared_variable_pairs() > 0
+    with pytest.raises(ValueError):
+        matrix.pairwise_sum(p, max_cells=0)
+    assert matrix.bounds(p, max_cells=0)["lower"] == pytest.approx(matrix.cutset_probabilities(p).max())
+
+
+@pytest.mark.parametrize("scale", [0.05, 1.0])
+@pytest.mark.parametrize("pairwise", [True, False])
+def test_bounds_contain_risk(full_example_system: SystemGraph, scale, pairwise):
+    matrix = CutsetMatrix(find_minimal_cutsets(full_example_system))
+    p = example_p(full_example_system, scale)
+    bounds = matrix.bounds(matrix.prob_vector(p), pairwise)
+    risk = risk_by_bdd(full_example_system, p)
+    assert bounds["lower"] <= risk + 1e-12
+    assert risk <= bounds["upper"] + 1e-12
+
+
+def test_bounds_batch(full_example_system: SystemGraph):
+    matrix = CutsetMatrix(find_minimal_cutsets(full_example_system))
+    P = np.stack([matrix.prob_vector(example_p(full_example_system, s)) for s in (0.01, 0.1, 0.5)])
+    batch = matrix.bounds(P)
+    for i in range(3):
+        single = matrix.bounds(P[i])
+        for key in single:
+            assert batch[key][i] == pytest.approx(single[key])
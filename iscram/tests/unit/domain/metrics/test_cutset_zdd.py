@@ -0,0 +1,67 @@
+import math
+
+import dd.cudd_zdd as _zdd
+import pytest
+
+from iscram.domain.model import SystemGraph
+from iscram.domain.metrics.cutset import mocus, find_minimal_cutsets
+from iscram.domain.metrics.cutset_zdd import minimal_cutsets, without
+
+from iscram.tests.unit.domain.metrics.test_bdd_functions import chain_of_diamonds
+
+
+def family(zdd, sets):
+    """ Builds a ZDD family from sets whose elements are listed in variable order. """
+    result = zdd.false
+    for s in sets:
+        f = zdd.true_node
+        for v in reversed(s):
+            f = zdd.find_or_add(v, zdd.false, f)
+        result = zdd.apply("or", result, f)
+    return result
+
+
+def test_without():
+    zdd = _zdd.ZDD()
+    zdd.configure(reordering=False)
+    zdd.declare("a", "b", "c")
+    P = family(zdd, [["a"], ["a", "b"], ["b", "c"], ["c"]])
+    Q = family(zdd, [["b"]])
+    assert without(zdd, P, Q) == family(zdd, [["a"], ["c"]])
+
+
+@pytest.mark.parametrize("name", ["minimal", "diamond", "diamond_suppliers", "canonical", "full_example_system"])
+@pytest.mark.parametrize("ignore_suppliers", [False, True])
+def test_minimal_cutsets_match_mocus(request, name, ignore_suppliers):
+    sg = request.getfixturevalue(name)
+    assert find_minimal_cutsets(sg, ignore_suppliers) == mocus(sg, ignore_suppliers)
+
+
+def test_minimal_cutsets_count_and_orders(full_example_system: SystemGraph):
+    cutsets = minimal_cutsets(full_example_system)
+    expected = mocus(full_example_system)
+    assert cutsets.count() == len(expected)
+    assert sum(cutsets.order_counts()) == len(expected)
+    assert cutsets.order_counts()[3] == sum(1 for c in expected if len(c) == 3)
+
+
+def test_minimal_cutsets_rare_event_probability(canonical: SystemGraph):
+    p = {u: 0.01 * (i + 1) for i, u in enumerate(sorted(canonical.nodes))}
+    expected = sum(math.prod(p[u] for u in c) for c in mocus(canonical))
+    assert minimal_cutsets(canonical).rare_event_probability(p) == pytest.approx(expected)
+
+
+def test_minimal_cutsets_deep_graph():
+    cutsets = minimal_cutsets(chain_of_diamonds(50))
+    assert cutsets.count() == 100
+    assert frozenset(["a0"]) in set(cutsets)
+
+
+def test_top_cutsets(full_example_system: SystemGraph):
+    p = {u: 0.02 + 0.9 * i / len(full_example_system.nodes) for i, u in enumerate(sorted(full_example_system.nodes))}
+    expected = sorted((math.prod(p[u] for u in c) for c in mocus(full_example_system)), reverse=True)
+
+    top = minimal_cutsets(full_example_system).top(p, 10)
+    assert [probability for _, probability in top] == pytest.approx(expected[:10])
+    assert all(probability == pytest.approx(math.prod(p[u] for u in c)) for c, probability in top)
+    assert len(minimal_cutsets(full_example_system).top(p, 10**6)) == len(expected)
@@ -0,0 +1,55 @@
+import itertools
+
+import pytest
+
+from iscram.domain.model import SystemGraph, DataValidationError
+from iscram.domain.metrics.diagnosis import posterior_probabilities
+from iscram.domain.metrics.probability_providers import provide_p_direct_from_data
+from iscram.domain.metrics.risk import risk_by_bdd
+
+
+def test_posteriors_by_enumeration(minimal: SystemGraph):
+    p = {"indicator": 0, "x1": 0.3, "x2": 0.6, "x3": 0.2}
+    nodes = ["x1", "x2", "x3"]
+    failed, joint = 0.0, {u: 0.0 for u in nodes}
+    for state in itertools.product([0, 1], repeat=3):
+        weight = 1
+        for u, x in zip(nodes, state):
+            weight *= p[u] if x else 1 - p[u]
+        if risk_by_bdd(minimal, {"indicator": 0, **dict(zip(nodes, state))}) == 1:
+            failed += weight
+            for u, x in zip(nodes, state):
+                joint[u] += weight * x
+
+    result = posterior_probabilities(minimal, p)
+    assert result["system_risk"] == pytest.approx(failed)
+    for u in nodes:
+        assert result["posteriors"][u] == pytest.approx(joint[u] / failed)
+
+
+def test_posteriors_with_evidence(full_example_system: SystemGraph, full_example_data_1):
+    p = provide_p_direct_from_data(full_example_system, full_example_data_1)
+    evidence = {"x16": False, "x3": True}
+    result = posterior_probabilities(full_example_system, p, evidence)
+    assert result["posteriors"]["x16"] == 0
+    assert result["posteriors"]["x3"] == 1
+
+    conditioned = {**p, "x16": 0.0, "x3": 1.0}
+    risk = risk_by_bdd(full_example_system, conditioned)
+    for u in ("x1", "x25"):
+        expected = p[u] * risk_by_bdd(full_example_system, {**conditioned, u: 1.0}) / risk
+        assert result["posteriors"][u] == pytest.approx(expected)
+
+    intact = posterior_probabilities(full_example_system, p, system_failed=False)["posteriors"]
+    expected = p["x1"] * (1 - risk_by_bdd(full_example_system, {**p, "x1": 1.0})) / (1 - risk_by_bdd(full_example_system, p))
+    assert intact["x1"] == pytest.approx(expected)
+
+
+def test_impossible_evidence(minimal: SystemGraph):
+    with pytest.raises(DataValidationError):
+        posterior_probabilities(minimal, {"indicator": 0, "x1": 0.5, "x2": 0.5, "x3": 0.5}, {"x3": False, "x1": False})
+
+
+def test_evidence_on_indicator(minimal: SystemGraph):
+    with pytest.raises(DataValidationError):
+        posterior_probabilities(minimal, {"indicator": 0, "x1": 0.5, "x2": 0.5, "x3": 0.5}, {"indicator": True})
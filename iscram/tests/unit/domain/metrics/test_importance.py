@@ -1,10 +1,13 @@
 from pytest import approx
+import pytest
 from typing import Dict
 from iscram.domain.model import SystemGraph
 from iscram.domain.metrics.importance import (
-    birnbaum_importance, birnbaum_structural_importance, fractional_importance_of_attributes
+    birnbaum_importance, birnbaum_structural_importance, fractional_importance_of_attributes, importance_measures,
+    attribute_index, group_birnbaum_importance, joint_importance
 )
 from iscram.domain.metrics.probability_providers import provide_p_direct_from_data
+from iscram.domain.metrics.risk import risk_by_bdd
 
 
 def test_birnbaum_importance_minimal(minimal: SystemGraph):
@@ -18,6 +21,16 @@ def test_birnbaum_structural_importance_minimal(minimal: SystemGraph):
     assert b_imps == {"x1": 0.25, "x2": 0.25, "x3": 0.75}
 
 
+def test_birnbaum_importance_matches_conditioning(full_example_system: SystemGraph, full_example_data_1: Dict):
+    p = provide_p_direct_from_data(full_example_system, full_example_data_1)
+    b_imps = birnbaum_importance(full_example_system, p)
+
+    for node, b_imp in b_imps.items():
+        top = risk_by_bdd(full_example_system, {**p, node: 1.0})
+        bottom = risk_by_bdd(full_example_system, {**p, node: 0.0})
+        assert b_imp == pytest.approx(top - bottom)
+
+
 def test_select_birnbaum_importance(minimal: SystemGraph):
     p = {"x1": 0, "x2": 0, "x3": 0, "indicator": 0}
     b_imps = birnbaum_importance(minimal, p, select=["x2", "x3"])
@@ -37,3 +50,50 @@ def test_fractional_importance_traits(full_example_system: SystemGraph, full_exa
     assert approx((9/28), f_imps["domestic"][True])
     assert approx((7/28), f_imps["certified"][False])
     assert approx((7/28), f_imps["certified"][True])
+
+
+def test_importance_measures_match_conditioning(full_example_system: SystemGraph, full_example_data_1: Dict):
+    p = provide_p_direct_from_data(full_example_system, full_example_data_1)
+    risk = risk_by_bdd(full_example_system, p)
+    measures = importance_measures(full_example_system, p)
+
+    for node, m in measures.items():
+        top = risk_by_bdd(full_example_system, {**p, node: 1.0})
+        bottom = risk_by_bdd(full_example_system, {**p, node: 0.0})
+        assert m["improvement_potential"] == pytest.approx(risk - bottom)
+        assert m["raw"] == pytest.approx(top / risk)
+        assert m["rrw"] == pytest.approx(risk / bottom)
+        assert m["criticality"] == pytest.approx(p[node] * (top - bottom) / risk)
+
+
+def test_importance_measures_zero_risk(minimal: SystemGraph):
+    measures = importance_measures(minimal, {"x1": 0, "x2": 0, "x3": 0, "indicator": 0})
+    assert measures["x3"]["raw"] is None
+    assert measures["x3"]["improvement_potential"] == 0
+
+
+def test_group_birnbaum_importance(full_example_system: SystemGraph, full_example_data_1: Dict):
+    p = provide_p_direct_from_data(full_example_system, full_example_data_1)
+    index = attribute_index(full_example_data_1)
+    groups = [index["domestic"][False], index["certified"][True], []]
+    imps = group_birnbaum_importance(full_example_system, p, groups)
+    for group, imp in zip(groups, imps):
+        assert imp == pytest.approx(birnbaum_importance(full_example_system, dict(p), select=group)["select"])
+    assert imps[2] == 0
+
+
+def test_joint_importance_matches_conditioning(full_example_system: SystemGraph, full_example_data_1: Dict):
+    p = provide_p_direct_from_data(full_example_system, full_example_data_1)
+    pairs = joint_importance(full_example_system, p, nodes=["x1", "x16", "x25", "x3"])
+    assert len(pairs) == 6
+    for i, j, value in pairs:
+        def risk(a, b):
+            return risk_by_bdd(full_example_system, {**p, i: a, j: b})
+        assert value == pytest.approx(risk(1, 1) - risk(1, 0) - risk(0, 1) + risk(0, 0))
+
+
+def test_joint_importance_threshold(full_example_system: SystemGraph, full_example_data_1: Dict):
+    p = provide_p_direct_from_data(full_example_system, full_example_data_1)
+    pairs = joint_importance(full_example_system, p, threshold=0.1)
+    assert all(abs(value) > 0.1 for _, _, value in pairs)
+    assert [abs(v) for _, _, v in pairs] == sorted((abs(v) for _, _, v in pairs), reverse=True)
@@ -0,0 +1,25 @@
+import pytest
+
+from iscram.domain.model import SystemGraph
+from iscram.domain.metrics.compiled_bdd import compiled_bdd_gradient
+from iscram.domain.metrics.incremental import IncrementalEvaluation
+from iscram.domain.metrics.probability_providers import provide_p_direct_from_data
+
+
+def test_updates_match_full_evaluation(full_example_system: SystemGraph, full_example_data_1):
+    cbdd = full_example_system.get_compiled_bdd()
+    p = provide_p_direct_from_data(full_example_system, full_example_data_1)
+    evaluation = IncrementalEvaluation(cbdd, p)
+
+    for node, value in (("x16", 0.4), ("x3", 0.0), ("x16", 0.02), ("x25", 1.0)):
+        p[node] = value
+        assert 0 < evaluation.update({node: value}) < len(cbdd)
+        risk, grad = compiled_bdd_gradient(cbdd, p)
+        assert evaluation.risk() == pytest.approx(risk)
+        assert list(evaluation.gradient().values()) == pytest.approx(grad)
+
+
+def test_unchanged_update_is_free(minimal: SystemGraph):
+    p = {"indicator": 0, "x1": 0.5, "x2": 0.5, "x3": 0.5}
+    evaluation = IncrementalEvaluation(minimal.get_compiled_bdd(), p)
+    assert evaluation.update(p) == 0
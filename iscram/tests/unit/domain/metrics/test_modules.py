@@ -0,0 +1,75 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from iscram.domain.model import SystemGraph, Node, Edge
+from iscram.domain.metrics.bdd_functions import prep_for_bdd
+from iscram.domain.metrics.compiled_bdd import compiled_bdd_prob, compiled_bdd_gradient
+from iscram.domain.metrics.modules import ModularDecomposition, find_modules, module_variable
+
+
+def two_subsystems():
+    """ a and b are independent subsystems; c is shared by both children of b, so they are not modules. """
+    nodes = {"indicator": Node(logic={"component": "or"}, tags=frozenset(["indicator"]))}
+    for u in ["a", "a1", "a2", "b", "b1", "b2", "c"]:
+        nodes[u] = Node(logic={"component": "and"}, tags=frozenset(["component"]))
+    edges = [Edge(src=s, dst=d) for s, d in [
+        ("a", "indicator"), ("b", "indicator"), ("a1", "a"), ("a2", "a"),
+        ("b1", "b"), ("b2", "b"), ("c", "b1"), ("c", "b2")
+    ]]
+    return SystemGraph(nodes=nodes, edges=edges)
+
+
+def example_p(sg):
+    p = {u: 0.05 + 0.9 * i / len(sg.nodes) for i, u in enumerate(sorted(sg.nodes))}
+    p["indicator"] = 0
+    return p
+
+
+def test_find_modules():
+    g, _, post_order = prep_for_bdd(two_subsystems())
+    assert find_modules(g, post_order) == ["a", "b", "indicator"]
+
+
+def test_find_modules_diamond(diamond: SystemGraph):
+    g, _, post_order = prep_for_bdd(diamond)
+    assert find_modules(g, post_order) == ["indicator"]
+
+
+def test_modules_use_pseudo_variables():
+    modules = ModularDecomposition(two_subsystems(), min_size=1)
+    assert modules.children["indicator"] == ["a", "b"]
+    assert set(modules.compiled["indicator"].var_names) == {"indicator", module_variable("a"), module_variable("b")}
+    assert modules.levels() == [["a", "b"], ["indicator"]]
+
+
+@pytest.mark.parametrize("min_size", [1, 4, 1000])
+def test_modular_risk_matches_bdd(full_example_system: SystemGraph, min_size):
+    p = example_p(full_example_system)
+    expected = compiled_bdd_prob(full_example_system.get_compiled_bdd(), p)
+    assert ModularDecomposition(full_example_system, min_size).risk(p) == pytest.approx(expected)
+
+
+def test_modular_gradient_matches_bdd(full_example_system: SystemGraph):
+    p = example_p(full_example_system)
+    cbdd = full_example_system.get_compiled_bdd()
+    expected_risk, expected_grad = compiled_bdd_gradient(cbdd, p)
+
+    risk, grad = ModularDecomposition(full_example_system, min_size=1).gradient(p)
+    assert risk == pytest.approx(expected_risk)
+    for v, d in zip(cbdd.var_names, expected_grad):
+        assert grad[v] == pytest.approx(d)
+
+
+def test_modules_reused_across_graphs():
+    first = ModularDecomposition(two_subsystems(), min_size=1)
+    second = ModularDecomposition(two_subsystems(), min_size=1)
+    assert all(first.compiled[m] is second.compiled[m] for m in first.modules)
+
+
+def test_modular_risk_with_executor():
+    sg = two_subsystems()
+    p = example_p(sg)
+    modules = ModularDecomposition(sg, min_size=1)
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        assert modules.risk(p, executor) == pytest.approx(modules.risk(p))
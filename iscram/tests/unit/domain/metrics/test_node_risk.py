@@ -0,0 +1,37 @@
+import dd.cudd as _bdd
+import pytest
+
+from iscram.domain.model import SystemGraph
+from iscram.domain.metrics.bdd_functions import prep_for_bdd, build_node_functions
+from iscram.domain.metrics.compiled_bdd import compile_bdd, compiled_bdd_prob
+from iscram.domain.metrics import node_risk
+from iscram.domain.metrics.node_risk import NodeFunctions
+from iscram.domain.metrics.probability_providers import provide_p_direct_from_data
+from iscram.domain.metrics.risk import risk_by_bdd, risk_by_node
+
+
+def test_node_risks_match_separate_bdds(full_example_system: SystemGraph, full_example_data_1):
+    p = provide_p_direct_from_data(full_example_system, full_example_data_1)
+    risks = NodeFunctions(full_example_system).node_risks(p)
+    assert risks["indicator"] == pytest.approx(risk_by_bdd(full_example_system, p))
+
+    g, discovered, post_order = prep_for_bdd(full_example_system)
+    bdd = _bdd.BDD()
+    bdd.declare(*discovered)
+    memo = build_node_functions(full_example_system, g, post_order, bdd)
+    assert set(risks) == set(post_order)
+    for node in post_order:
+        assert risks[node] == pytest.approx(compiled_bdd_prob(compile_bdd(bdd, memo[node]), p))
+
+
+def test_node_functions_reuse_manager_build(diamond: SystemGraph, monkeypatch):
+    diamond.get_bdd_with_root()
+    monkeypatch.setattr(node_risk, "build_bdd_with_report", None)
+    risks = NodeFunctions(diamond).node_risks({u: 0.2 for u in diamond.nodes})
+    assert risks["indicator"] == pytest.approx(risk_by_bdd(diamond, {u: 0.2 for u in diamond.nodes}))
+
+
+def test_risk_by_node_on_trees(canonical: SystemGraph):
+    p = {u: 0.1 for u in canonical.nodes}
+    expected = NodeFunctions(canonical).node_risks(p)
+    assert risk_by_node(canonical, p) == pytest.approx(expected)
@@ -7,7 +7,7 @@ from iscram.domain.metrics.probability_providers import (
 )
 
 from iscram.domain.metrics.risk import (
-    risk_by_cutsets, risk_by_bdd, probability_any_cutset
+    risk_by_cutsets, risk_by_bdd, risk_by_bdd_batch, risk_bounds_by_cutsets, probability_any_cutset
 )
 
 
@@ -35,6 +35,12 @@ def test_risk_by_bdd_minimal(minimal: SystemGraph):
     assert (risk_by_bdd(minimal, {"indicator": 0, "x1": 0, "x2": 0, "x3": .25}) == .25)
 
 
+def test_risk_by_bdd_batch_minimal(minimal: SystemGraph):
+    variables = ["x3", "x2", "x1", "indicator"]
+    P = [[0, 0, 0, 0], [1, 0, 0, 0], [0, 1, 1, 0], [0, .5, .5, 0], [.25, 0, 0, 0]]
+    assert list(risk_by_bdd_batch(minimal, P, variables)) == [0, 1, 1, .25, .25]
+
+
 def test_risk_by_cutset_canonical(canonical: SystemGraph):
     assert approx(risk_by_cutsets(canonical, provide_p_unknown_data(canonical)) == 0.9748495630919933)
 
@@ -65,3 +71,9 @@ def test_manual_risk_cutsets_canonical():
     p = {"x1": 0.5, "x2": 0.5, "x3": 0.5, "x4": 0.5, "x5": 0.5, "x6": 0.5, "x7": 0.5, "x8": 0.5, "x9": 0.5}
     assert approx(probability_any_cutset(cutsets, p) == 0.9748495630919933)
 
+
+def test_risk_bounds_by_cutsets(canonical: SystemGraph):
+    p = {u: 0.1 for u in canonical.nodes}
+    p["indicator"] = 0
+    bounds = risk_bounds_by_cutsets(canonical, p)
+    assert bounds["lower"] <= risk_by_bdd(canonical, p) <= bounds["upper"]
@@ -0,0 +1,56 @@
+import pytest
+
+from iscram.domain.model import SystemGraph, Node, Edge
+from iscram.domain.metrics.compiled_bdd import compiled_bdd_gradient
+from iscram.domain.metrics.risk import risk_by_bdd, risk_by_simplified_bdd
+from iscram.domain.metrics.simplify import SimplifiedGraph
+
+
+def example_p(sg):
+    p = {u: 0.05 + 0.9 * i / len(sg.nodes) for i, u in enumerate(sorted(sg.nodes))}
+    p["indicator"] = 0
+    return p
+
+
+def test_simplify_prunes_unreachable(full_example_system: SystemGraph):
+    stats = SimplifiedGraph(full_example_system).statistics()
+    assert stats["reachable_nodes"] < stats["nodes"]
+    assert stats["variables"] < stats["reachable_nodes"]
+
+
+def test_simplify_tree_to_single_event(canonical: SystemGraph):
+    simplified = SimplifiedGraph(canonical)
+    assert len(simplified.gates) == 0
+    assert len(simplified.compiled.var_names) == 1
+
+
+def test_simplify_flattens_same_logic():
+    nodes = {
+        "indicator": Node(logic={"component": "or"}, tags=frozenset(["indicator"])),
+        "a": Node(logic={"component": "or"}, tags=frozenset(["component"])),
+        "b": Node(logic={"component": "and"}, tags=frozenset(["component"])),
+        "c": Node(logic={"component": "and"}, tags=frozenset(["component"]))
+    }
+    edges = [Edge(src="a", dst="indicator"), Edge(src="b", dst="a"), Edge(src="c", dst="a"),
+             Edge(src="b", dst="indicator")]
+    simplified = SimplifiedGraph(SystemGraph(nodes=nodes, edges=edges), coalesce=False)
+    assert list(simplified.gates) == ["@gate_indicator"]
+    assert simplified.gates["@gate_indicator"][0] == "or"
+    assert sorted(simplified.gates["@gate_indicator"][1]) == ["a", "b", "c", "indicator"]
+
+
+@pytest.mark.parametrize("coalesce", [True, False])
+def test_simplified_risk_and_gradient(full_example_system: SystemGraph, coalesce):
+    p = example_p(full_example_system)
+    cbdd = full_example_system.get_compiled_bdd()
+    expected_risk, expected_grad = compiled_bdd_gradient(cbdd, p)
+
+    risk, grad = SimplifiedGraph(full_example_system, coalesce).gradient(p)
+    assert risk == pytest.approx(expected_risk)
+    for v, d in zip(cbdd.var_names, expected_grad):
+        assert grad[v] == pytest.approx(d)
+
+
+def test_risk_by_simplified_bdd(canonical: SystemGraph):
+    p = example_p(canonical)
+    assert risk_by_simplified_bdd(canonical, p) == pytest.approx(risk_by_bdd(canonical, p))
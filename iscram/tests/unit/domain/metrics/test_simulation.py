@@ -0,0 +1,88 @@
+import itertools
+
+import numpy as np
+import pytest
+
+from iscram.domain.model import SystemGraph
+from iscram.domain.metrics.risk import risk_by_bdd, risk_by_simulation, risk_by_importance_sampling
+from iscram.domain.metrics.simulation import (
+    StructureProgram, sample_packed_events, simulate_risk, wilson_interval, importance_sample_risk
+)
+
+
+def pack_trials(X: np.ndarray) -> np.ndarray:
+    """ Packs a (variables x trials) boolean array into (variables x words) uint64, zero padded. """
+    words = -(-X.shape[1] // 64)
+    padded = np.zeros((X.shape[0], words * 64), dtype=bool)
+    padded[:, :X.shape[1]] = X
+    return np.packbits(padded, axis=1, bitorder="little").view(np.uint64)
+
+
+def sample_events(rng, q: np.ndarray, trials: int) -> np.ndarray:
+    """ Independent (variables x trials) Bernoulli samples; certain events are not drawn. """
+    X = np.zeros((len(q), trials), dtype=bool)
+    for i, qi in enumerate(q):
+        if qi >= 1:
+            X[i] = True
+        elif qi > 0:
+            X[i] = rng.random(trials) < qi
+    return X
+
+
+def test_structure_program_matches_bdd_on_every_state(minimal: SystemGraph):
+    program = StructureProgram(minimal)
+    states = list(itertools.product([0, 1], repeat=len(program.variables)))
+    X = np.asarray(states, dtype=bool).T
+    root = np.unpackbits(program.evaluate(pack_trials(X)).view(np.uint8), bitorder="little")[:len(states)]
+    for state, failed in zip(states, root):
+        assert failed == risk_by_bdd(minimal, dict(zip(program.variables, state)))
+
+
+def test_sample_packed_events_matches_sample_events():
+    q = np.asarray([0.0, 0.3, 1.0, 0.9])
+    expected = pack_trials(sample_events(np.random.default_rng(4), q, 1000))
+    assert np.array_equal(sample_packed_events(np.random.default_rng(4), q, 1000), expected)
+
+
+def test_simulation_confidence_interval(full_example_system: SystemGraph):
+    p = {u: 0.1 for u in full_example_system.nodes}
+    expected = risk_by_bdd(full_example_system, p)
+    result = simulate_risk(full_example_system, p, trials=200_000, seed=3)
+    low, high = result["confidence_interval"]
+    assert low <= expected <= high
+    assert result["risk"] == pytest.approx(expected, abs=5 * result["standard_error"])
+
+
+def test_simulation_is_reproducible_across_workers(diamond: SystemGraph):
+    p = {u: 0.3 for u in diamond.nodes}
+    serial = simulate_risk(diamond, p, trials=20_000, seed=11)
+    parallel = simulate_risk(diamond, p, trials=20_000, seed=11, workers=2)
+    assert serial == parallel
+    assert risk_by_simulation(diamond, p, trials=20_000, seed=11) == serial["risk"]
+
+
+def test_simulation_certain_events(minimal: SystemGraph):
+    assert risk_by_simulation(minimal, {"indicator": 0, "x1": 0, "x2": 0, "x3": 1}, trials=1000) == 1
+    assert risk_by_simulation(minimal, {"indicator": 0, "x1": 1, "x2": 0, "x3": 0}, trials=1000) == 0
+
+
+def test_wilson_interval_without_failures():
+    low, high = wilson_interval(0, 1000)
+    assert low == pytest.approx(0)
+    assert 0 < high < 0.01
+
+
+def test_importance_sampling_rare_risk(minimal: SystemGraph):
+    p = {"indicator": 0, "x1": 1e-4, "x2": 1e-4, "x3": 1e-8}
+    result = importance_sample_risk(minimal, p, trials=50_000, seed=5)
+    assert result["relative_error"] < 0.05
+    assert result["risk"] == pytest.approx(risk_by_bdd(minimal, p), rel=0.1)
+    assert result["biased_probabilities"]["indicator"] == 0
+
+
+def test_importance_sampling_matches_bdd(full_example_system: SystemGraph):
+    p = {u: 1e-3 for u in full_example_system.nodes}
+    p["indicator"] = 0
+    result = importance_sample_risk(full_example_system, p, seed=2)
+    assert result["risk"] == pytest.approx(risk_by_bdd(full_example_system, p), abs=5 * result["standard_error"])
+    assert risk_by_importance_sampling(full_example_system, p, seed=2) == result["risk"]
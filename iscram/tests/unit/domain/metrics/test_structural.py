@@ -0,0 +1,48 @@
+import itertools
+
+import pytest
+
+from iscram.domain.model import SystemGraph
+from iscram.domain.metrics.risk import risk_by_bdd
+from iscram.domain.metrics.structural import structural_risk_distribution, structural_uncertainty
+
+
+def realized_risks(sg: SystemGraph, p, edges):
+    """ Risk of every realization of the uncertain edges, by building each graph separately. """
+    for mask in itertools.product([False, True], repeat=len(edges)):
+        dropped = set(e for e, keep in zip(edges, mask) if not keep)
+        realized = SystemGraph(nodes=sg.nodes, edges=[e for e in sg.edges if (e.src, e.dst) not in dropped])
+        yield mask, risk_by_bdd(realized, p)
+
+
+def test_expected_risk_matches_enumeration(full_example_system: SystemGraph):
+    edges = [(e.src, e.dst) for e in full_example_system.edges][:6]
+    existence = {e: 0.2 + 0.1 * k for k, e in enumerate(edges)}
+    p = {u: 0.1 for u in full_example_system.nodes}
+    p["indicator"] = 0
+
+    expected = 0
+    for mask, risk in realized_risks(full_example_system, p, edges):
+        weight = 1
+        for e, keep in zip(edges, mask):
+            weight *= existence[e] if keep else 1 - existence[e]
+        expected += weight * risk
+    assert structural_uncertainty(full_example_system, existence).expected_risk(p, existence) == pytest.approx(expected)
+
+
+def test_and_group_without_edges(diamond: SystemGraph):
+    # Every edge into an "and" group may be missing; the group then no longer fails.
+    edges = [(e.src, e.dst) for e in diamond.edges]
+    p = {u: 0.5 for u in diamond.nodes}
+    p["indicator"] = 0
+    model = structural_uncertainty(diamond, {e: 0.5 for e in edges})
+    for mask, risk in realized_risks(diamond, p, edges):
+        assert model.sample_risks(p, {e: float(keep) for e, keep in zip(edges, mask)}, 3)[0][0] == pytest.approx(risk)
+
+
+def test_structural_distribution(full_example_system: SystemGraph, full_example_data_1):
+    full_example_data_1["edges"] = [{"src": "x1", "dst": "indicator", "existence": 0.5}]
+    result = structural_risk_distribution(full_example_system, full_example_data_1, samples=500, seed=0)
+    assert result["structures"] == 2
+    assert result["uncertain_edges"] == 1
+    assert result["risk"]["mean"] == pytest.approx(result["expected_risk"], abs=0.05)
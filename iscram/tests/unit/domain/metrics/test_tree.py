@@ -0,0 +1,50 @@
+import random
+
+import pytest
+
+from iscram.domain.model import SystemGraph
+from iscram.domain.metrics.bdd_functions import build_bdd
+from iscram.domain.metrics.bdd_manager import get_bdd_manager
+from iscram.domain.metrics.compiled_bdd import compile_bdd, compiled_bdd_gradient
+from iscram.domain.metrics.importance import birnbaum_importance
+from iscram.domain.metrics.risk import risk_by_bdd
+from iscram.domain.metrics.tree import tree_structure
+
+from iscram.tests.unit.domain.model.gen_random_sg import gen_random_tree
+
+
+def test_tree_detection(canonical: SystemGraph, diamond: SystemGraph, full_example_system: SystemGraph):
+    assert tree_structure(canonical) is not None
+    assert tree_structure(diamond) is None
+    assert tree_structure(full_example_system) is None
+
+
+def test_tree_matches_bdd():
+    random.seed(7)
+    sg, data = gen_random_tree(200)
+    p = {u: data[u]["risk"] * 5 for u in sg.nodes}
+
+    expected_risk, expected_grad = compiled_bdd_gradient(compile_bdd(*build_bdd(sg)), p)
+    risk, grad = tree_structure(sg).gradient(p)
+    assert risk == pytest.approx(expected_risk)
+    assert tree_structure(sg).risk(p) == pytest.approx(expected_risk)
+    for v, d in zip(compile_bdd(*build_bdd(sg)).var_names, expected_grad):
+        assert grad[v] == pytest.approx(d)
+
+
+def test_tree_gradient_with_certain_events(canonical: SystemGraph):
+    p = {u: 1.0 if i % 3 == 0 else 0.0 for i, u in enumerate(sorted(canonical.nodes))}
+    p["indicator"] = 0
+    expected_risk, expected_grad = compiled_bdd_gradient(compile_bdd(*build_bdd(canonical)), p)
+    risk, grad = tree_structure(canonical).gradient(p)
+    assert risk == pytest.approx(expected_risk)
+    assert [grad[v] for v in compile_bdd(*build_bdd(canonical)).var_names] == pytest.approx(expected_grad)
+
+
+def test_tree_skips_bdd(canonical: SystemGraph):
+    p = {u: 0.1 for u in canonical.nodes}
+    p["indicator"] = 0
+    get_bdd_manager().release(canonical.get_id())
+    risk_by_bdd(canonical, p)
+    birnbaum_importance(canonical, p)
+    assert canonical.get_id() not in get_bdd_manager()
@@ -0,0 +1,41 @@
+import numpy as np
+import pytest
+
+from iscram.domain.model import SystemGraph, DataValidationError, validate_data
+from iscram.domain.metrics.probability_providers import provide_p_direct_from_data
+from iscram.domain.metrics.risk import risk_by_bdd
+from iscram.domain.metrics.uncertainty import sample_probabilities, risk_distribution
+
+
+def test_point_values_give_a_degenerate_distribution(full_example_system: SystemGraph, full_example_data_1):
+    expected = risk_by_bdd(full_example_system, provide_p_direct_from_data(full_example_system, full_example_data_1))
+    result = risk_distribution(full_example_system, full_example_data_1, samples=50)
+    assert result["risk"]["mean"] == pytest.approx(expected)
+    assert result["risk"]["std"] == pytest.approx(0, abs=1e-12)
+
+
+def test_sampled_distributions(minimal: SystemGraph):
+    data = {
+        "nodes": {
+            "x1": {"distribution": {"type": "beta", "alpha": 2, "beta": 2}},
+            "x2": {"distribution": {"type": "uniform", "low": 0.2, "high": 0.4}},
+            "x3": {"risk": 0.1, "distribution": {"type": "empirical", "samples": [0.1, 0.3]}}
+        }
+    }
+    P = sample_probabilities(minimal, data, ["x1", "x2", "x3", "indicator"], 20000, seed=1)
+    assert P[:, 0].mean() == pytest.approx(0.5, abs=0.01)
+    assert P[:, 1].min() >= 0.2 and P[:, 1].max() <= 0.4
+    assert set(np.unique(P[:, 2])) == {0.1, 0.3}
+    assert np.all(P[:, 3] == 0)
+
+    result = risk_distribution(minimal, data, samples=20000, seed=1)
+    # risk = x3 | (x1 & x2) with independent inputs, so its mean is the risk at the mean probabilities
+    assert result["risk"]["mean"] == pytest.approx(1 - (1 - 0.2) * (1 - 0.5 * 0.3), abs=0.005)
+    assert result["importance"]["x3"]["mean"] == pytest.approx(1 - 0.5 * 0.3, abs=0.005)
+
+
+def test_invalid_distribution(minimal: SystemGraph):
+    with pytest.raises(DataValidationError):
+        validate_data(minimal, {"nodes": {"x1": {"distribution": {"type": "beta", "alpha": 0, "beta": 1}}}})
+    with pytest.raises(DataValidationError):
+        validate_data(minimal, {"nodes": {"x1": {"distribution": {"type": "normal"}}}})
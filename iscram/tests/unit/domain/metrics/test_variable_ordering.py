@@ -0,0 +1,59 @@
+import pytest
+
+from iscram.domain.model import SystemGraph
+from iscram.domain.metrics.bdd_functions import (
+    prep_for_bdd, build_bdd, build_bdd_with_report, reorder_with_time_limit
+)
+from iscram.domain.metrics.compiled_bdd import compile_bdd, compiled_bdd_prob
+from iscram.domain.metrics.variable_ordering import ORDERING_HEURISTICS, variable_order
+
+
+@pytest.mark.parametrize("heuristic", sorted(ORDERING_HEURISTICS))
+def test_variable_order_is_permutation(full_example_system: SystemGraph, heuristic):
+    g, discovered, post_order = prep_for_bdd(full_example_system)
+    order = variable_order(g, discovered, post_order, heuristic)
+    assert sorted(order) == sorted(discovered)
+
+
+def test_variable_order_unknown(full_example_system: SystemGraph):
+    g, discovered, post_order = prep_for_bdd(full_example_system)
+    with pytest.raises(ValueError):
+        variable_order(g, discovered, post_order, "alphabetical")
+
+
+@pytest.mark.parametrize("heuristic", sorted(ORDERING_HEURISTICS))
+def test_build_bdd_ordering_preserves_risk(full_example_system: SystemGraph, heuristic):
+    p = {v: 0.1 + 0.8 * i / len(full_example_system.nodes) for i, v in enumerate(sorted(full_example_system.nodes))}
+    p["indicator"] = 0
+
+    expected = compiled_bdd_prob(compile_bdd(*build_bdd(full_example_system)), p)
+    bdd, root = build_bdd(full_example_system, ordering=heuristic, reorder="none")
+    assert compiled_bdd_prob(compile_bdd(bdd, root), p) == pytest.approx(expected)
+
+
+def test_build_bdd_without_reorder_keeps_order(full_example_system: SystemGraph):
+    g, discovered, post_order = prep_for_bdd(full_example_system)
+    bdd, _ = build_bdd(full_example_system, ordering="bfs", reorder="none")
+    assert [bdd.var_at_level(i) for i in range(len(bdd.vars))] == variable_order(g, discovered, post_order, "bfs")
+
+
+def test_build_bdd_with_report(full_example_system: SystemGraph):
+    bdd, root, report = build_bdd_with_report(full_example_system, reorder_time_limit=1.0)
+    assert report["variables"] == len(bdd.vars)
+    assert report["nodes"] == root.dag_size
+    assert report["nodes"] <= report["nodes_before_reorder"]
+    assert report["reorder_seconds"] < 5
+
+
+def test_build_bdd_unknown_reorder(minimal: SystemGraph):
+    with pytest.raises(ValueError):
+        build_bdd(minimal, reorder="window")
+
+
+def test_reorder_with_time_limit_restores_config(full_example_system: SystemGraph):
+    bdd, root = build_bdd(full_example_system, reorder="none")
+    saved = bdd.configure()["max_swaps"]
+    before = root.dag_size
+    reorder_with_time_limit(bdd, 0.5, swaps_per_round=10)
+    assert bdd.configure()["max_swaps"] == saved
+    assert root.dag_size <= before
@@ -2,7 +2,7 @@ import copy
 import pytest
 
 from iscram.domain.model import (
-    Node, Edge, SystemGraph, validate_data
+    Node, Edge, SystemGraph, validate_data, merge_data
 )
 
 
@@ -195,3 +195,18 @@ def test_dict_nested_success(canonical: SystemGraph):
     d = canonical.dict()
     assert "nodes" in d and "edges" in d
     assert "x1" in d["nodes"] and d["nodes"]["x1"]["tags"] is not None
+
+
+def test_merge_data():
+    data = {
+        "nodes": {"x1": {"risk": 0.1, "cost": 3}, "x2": {"risk": 0.2}},
+        "edges": [{"src": "s1", "dst": "x1", "risk": 0.3, "cost": 5}, {"src": "s2", "dst": "x2", "risk": 0.4}]
+    }
+    delta = {
+        "nodes": {"x1": {"risk": 0.5}, "x2": None},
+        "edges": [{"src": "s1", "dst": "x1", "risk": 0.6}, {"src": "s2", "dst": "x2", "remove": True}]
+    }
+    merged = merge_data(data, delta)
+    assert merged["nodes"] == {"x1": {"risk": 0.5, "cost": 3}}
+    assert merged["edges"] == [{"src": "s1", "dst": "x1", "risk": 0.6}]
+    assert data["nodes"]["x1"]["risk"] == 0.1